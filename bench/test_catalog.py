@@ -0,0 +1,77 @@
+"""checks of the incremental catalog sync against a fake problemset listing"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leetcode  # noqa: E402
+
+
+def question(fid):
+    return {
+        "frontendQuestionId": fid,
+        "title": f"title {fid}",
+        "titleSlug": f"slug-{fid}".lower().replace(" ", "-"),
+        "titleCn": f"cn {fid}",
+    }
+
+
+@pytest.fixture
+def listing(tmp_path, monkeypatch):
+    """the problem list the fake problemsetQuestionList pages through"""
+    questions = [question(str(i)) for i in range(1, 31)]
+    skips = []
+
+    def page(keyword="", skip=0, limit=50):
+        skips.append(skip)
+        return {
+            "questions": questions[skip : skip + limit],
+            "total": len(questions),
+            "hasMore": skip + limit < len(questions),
+        }
+
+    monkeypatch.setattr(leetcode, "problemset_page", page)
+    monkeypatch.setattr(leetcode.Catalog, "path", str(tmp_path / "catalog.json"))
+    monkeypatch.setattr(leetcode.Catalog, "page_size", 10)
+    return questions, skips
+
+
+def test_sync_fetches_only_the_tail(listing):
+    questions, skips = listing
+    catalog = leetcode.Catalog()
+    catalog.sync()
+    assert len(catalog.problems) == 30
+    assert skips == [0, 10, 20]
+    skips.clear()
+    questions.append(question("31"))
+    catalog.sync()
+    assert "31" in catalog.problems
+    assert skips == [20, 30]
+
+
+def test_sync_falls_back_when_inserted_before_the_tail(listing):
+    questions, skips = listing
+    catalog = leetcode.Catalog()
+    catalog.sync()
+    skips.clear()
+    # a new problem early in the list pushes a known one out of the tail
+    questions.insert(25, question("LCP 01"))
+    catalog.sync()
+    assert "lcp_01" in catalog.problems
+    assert skips[0] == 20 and skips[1:] == [0, 10, 20, 30]
+
+
+def test_sync_falls_back_when_the_tail_misses_new_problems(listing):
+    questions, skips = listing
+    catalog = leetcode.Catalog()
+    catalog.sync()
+    skips.clear()
+    # ahead of the overlap page, the tail only sees the shifted known ones
+    questions[2:2] = [question(f"LCR {i:03d}") for i in range(1, 11)]
+    catalog.sync()
+    assert len(catalog.problems) == 40
+    assert "lcr_001" in catalog.problems
+    assert skips[-4:] == [0, 10, 20, 30]
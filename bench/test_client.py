@@ -0,0 +1,158 @@
+"""checks of the transport retries and the response cache, against fake responses
+and the replay server"""
+
+import json
+import os
+import sys
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leetcode  # noqa: E402
+from leetcode import RateLimiter, ReplayServer, ResponseCache, Transport  # noqa: E402
+
+
+class Response(object):
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_retry_after_seconds():
+    transport = Transport(max_backoff=60)
+    assert transport.delay(0, Response(429, {"Retry-After": "3"})) == 3.0
+    assert transport.delay(0, Response(429, {"Retry-After": "0.25"})) == 0.25
+    # capped, a server asking for an hour does not stall the run
+    assert transport.delay(0, Response(429, {"Retry-After": "3600"})) == 60
+
+
+def test_retry_after_http_date():
+    transport = Transport(max_backoff=60)
+    later = formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= transport.delay(0, Response(503, {"Retry-After": later})) <= 10
+    earlier = formatdate(time.time() - 10, usegmt=True)
+    assert transport.delay(0, Response(503, {"Retry-After": earlier})) == 0.0
+
+
+@pytest.mark.parametrize("headers", [{}, {"Retry-After": "soon"}])
+def test_backoff_without_usable_retry_after(headers):
+    transport = Transport(backoff=0.5, max_backoff=3)
+    for attempt, top in [(0, 0.5), (2, 2.0), (5, 3)]:
+        delay = transport.delay(attempt, Response(429, headers))
+        assert top / 2 <= delay <= top
+    assert 0.25 <= transport.delay(0, None) <= 0.5
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    """start a replay server, yield (server, graphql url)"""
+    monkeypatch.setattr(leetcode, "limiter", RateLimiter(rate=1000, burst=100))
+    servers = []
+
+    def start(**kwargs):
+        replay = ReplayServer(**kwargs)
+        replay.questions["two-sum"] = {"questionFrontendId": "1"}
+        server = replay.server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return replay, f"http://127.0.0.1:{server.server_address[1]}/graphql/"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def question_payload(slug):
+    return {
+        "operationName": "getQuestionDetail",
+        "variables": {"titleSlug": slug},
+        "query": "query getQuestionDetail($titleSlug: String!) {}",
+    }
+
+
+def test_replay_answers(replay):
+    _, url = replay()
+    rsp = Transport(retries=0).request("POST", url, json=question_payload("two-sum"))
+    assert rsp.json() == {"data": {"question": {"questionFrontendId": "1"}}}
+
+
+def test_throttled_requests_honor_retry_after(replay):
+    server, url = replay(throttle=1.0, retry_after=0.05)
+    transport = Transport(retries=2, backoff=10)
+    with pytest.raises(Exception, match="fail after 2 retries"):
+        transport.request("POST", url, json=question_payload("two-sum"))
+    assert server.stats["429"] == 3
+    assert transport.stats["throttled"] == 3
+    assert transport.stats["retries"] == 2
+    # the server asked for 0.05s, not the 10s of the exponential backoff
+    assert transport.stats["backoff"] == pytest.approx(0.1)
+
+
+def test_malformed_bodies_are_retried(replay):
+    server, url = replay(malformed=1.0)
+    transport = Transport(retries=1, backoff=0.01)
+    with pytest.raises(Exception, match="fail after 1 retries"):
+        transport.request("POST", url, json=question_payload("two-sum"))
+    assert server.stats["malformed"] == 2
+    assert transport.stats["malformed"] == 2
+
+
+def age(cache, key, seconds):
+    """make the entry of `key` `seconds` old, both stored time and mtime"""
+    file = cache.file(key)
+    with open(file, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    entry["time"] -= seconds
+    with open(file, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    at = time.time() - seconds
+    os.utime(file, (at, at))
+
+
+def test_cache_expires_after_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=100)
+    cache.set("question/a", {"x": 1})
+    assert cache.get("question/a") == {"x": 1}
+    age(cache, "question/a", 200)
+    assert cache.get("question/a") is None
+    # still there for peek and for offline runs
+    assert cache.peek("question/a") == {"x": 1}
+    cache.offline = True
+    assert cache.get("question/a") == {"x": 1}
+
+
+def test_cache_fetch_refetches_expired_and_skips_empty(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=100)
+    calls = []
+
+    def fetch(value):
+        calls.append(value)
+        return value
+
+    assert cache.fetch("k", lambda: fetch({"v": 1})) == {"v": 1}
+    assert cache.fetch("k", lambda: fetch({"v": 2})) == {"v": 1}
+    age(cache, "k", 200)
+    assert cache.fetch("k", lambda: fetch({"v": 3})) == {"v": 3}
+    assert cache.fetch("empty", lambda: fetch([])) == []
+    assert cache.peek("empty") is None
+    assert calls == [{"v": 1}, {"v": 3}, []]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    for n, key in enumerate("abcd"):
+        cache.set(key, "x" * 1000)
+        age(cache, key, 100 - n)
+    size = sum(i.stat().st_size for i in cache.entries())
+    # a hit counts as a use, "a" is now the newest
+    assert cache.get("a")
+    cache.max_size = size
+    cache.set("e", "x" * 1000)
+    kept = {k for k in "abcde" if cache.peek(k)}
+    assert kept == {"a", "d", "e"}
+    assert cache.size <= cache.max_size * 0.9
@@ -0,0 +1,211 @@
+"""unit checks of the codegen and source scanning helpers, run by pytest bench/"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leetcode  # noqa: E402
+from leetcode import (  # noqa: E402
+    Flat,
+    literal_emitter,
+    parse_literal,
+    rust_items,
+    split_args,
+    submission,
+    use_leaves,
+)
+
+
+def emit(text, type, is_return=False):
+    out = []
+    literal_emitter(type, is_return)(parse_literal(text), out)
+    return "".join(out)
+
+
+def test_parse_literal_flat_list():
+    value = parse_literal("[ 1, 2 ,3 ]")
+    assert isinstance(value, Flat)
+    assert value == ["1", "2", "3"]
+    assert parse_literal("[]") == []
+
+
+def test_parse_literal_nested_and_strings():
+    assert parse_literal("[[1,2],[3]]") == [["1", "2"], ["3"]]
+    assert parse_literal('["a,b","]"]') == ['"a,b"', '"]"']
+    assert parse_literal("[[]]") == [[]]
+
+
+def test_parse_literal_atoms():
+    assert parse_literal("null") == "null"
+    assert parse_literal('"x"') == '"x"'
+    assert parse_literal("  -7 ") == "-7"
+
+
+@pytest.mark.parametrize("text", ["[1,2", "[1]]", "1 2"])
+def test_parse_literal_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        parse_literal(text)
+
+
+def test_split_args_drops_names():
+    assert split_args('nums = [1,2], s = "x,y", k = 3') == ["[1,2]", '"x,y"', "3"]
+
+
+def test_split_args_keeps_nested_commas():
+    assert split_args('[[1,2],[3]], "a"') == ["[[1,2],[3]]", '"a"']
+    assert split_args("") == []
+
+
+@pytest.mark.parametrize(
+    "text, type, is_return, expected",
+    [
+        ("[[1,2],[3]]", "Vec<Vec<i32>>", False, "vec![vec![1,2],vec![3]]"),
+        ('["a","b"]', "Vec<String>", False, 'svec!["a","b"]'),
+        ('["a","b"]', "Vec<String>", True, 'vec!["a","b"]'),
+        ('"ab"', "String", False, 'String::from("ab")'),
+        ('"a"', "char", False, "'a'"),
+        ('[["a"]]', "Vec<Vec<char>>", False, "vec![vec!['a']]"),
+        ("3", "f64", False, "3.0"),
+        ("2.5", "f64", False, "2.5"),
+        ("null", "Option<i32>", False, "None"),
+        ("4", "Option<i32>", False, "Some(4)"),
+        ("[1,null,2]", "Option<Rc<RefCell<TreeNode>>>", False, "tree![1,null,2]"),
+        ("[1,2]", "Option<Box<ListNode>>", False, "link![1,2]"),
+    ],
+)
+def test_literal_emitter(text, type, is_return, expected):
+    assert emit(text, type, is_return) == expected
+
+
+def test_literal_emitter_rejects_wrong_shape():
+    with pytest.raises(ValueError):
+        emit("3", "Vec<i32>")
+    with pytest.raises(ValueError):
+        emit("[[1]]", "Option<Box<ListNode>>")
+
+
+SOURCE = """//! title
+#![allow(dead_code)]
+use std::collections::{HashMap, HashSet as Set};
+
+/// doc
+#[derive(Debug)]
+struct P { x: i32 }
+
+impl Ord for P {
+    fn cmp(&self, o: &Self) -> Ordering { let s = "}"; let c = '{'; self.x.cmp(&o.x) }
+}
+
+const M: i64 = 1_000_000_007;
+
+// comment { not a brace
+pub fn solve(v: Vec<i32>) -> i32 { /* } */ v.len() as i32 }
+
+fn main() {
+    assert_eq!(solve(vec![1]), 1);
+}
+"""
+
+
+def test_rust_items_kinds_and_names():
+    items = rust_items(SOURCE)
+    assert [(i["kind"], i["name"]) for i in items] == [
+        ("use", "std"),
+        ("struct", "P"),
+        ("impl", "P"),
+        ("const", "M"),
+        ("fn", "solve"),
+        ("fn", "main"),
+    ]
+
+
+def test_rust_items_text():
+    items = {i["name"]: i for i in rust_items(SOURCE) if i["kind"] != "impl"}
+    # docs and attributes belong to the item, braces in strings, chars and
+    # comments do not end it
+    assert items["P"]["text"] == "/// doc\n#[derive(Debug)]\nstruct P { x: i32 }"
+    assert SOURCE[items["P"]["start"] :].startswith("/// doc")
+    assert items["solve"]["text"].endswith("v.len() as i32 }")
+    assert "HashMap" in items["std"]["idents"]
+    impl = next(i for i in rust_items(SOURCE) if i["kind"] == "impl")
+    assert impl["text"].endswith("self.x.cmp(&o.x) }\n}")
+
+
+def test_use_leaves():
+    assert use_leaves("leetcode::treenode::TreeNode") == [
+        ("leetcode::treenode", "TreeNode")
+    ]
+    assert use_leaves("std::collections::{HashMap, HashSet as Set}") == [
+        ("std::collections", "HashMap"),
+        ("std::collections", "HashSet as Set"),
+    ]
+    assert use_leaves("std::{cmp::{max, min}, mem}") == [
+        ("std::cmp", "max"),
+        ("std::cmp", "min"),
+        ("std", "mem"),
+    ]
+
+
+def solution_source(pid):
+    """a solution of the repo, in either layout"""
+    for folder in ("bin", "problems"):
+        path = os.path.join(leetcode.BASE_DIR, "src", folder, f"leetcode_{pid}.rs")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+    pytest.skip(f"no solution {pid}")
+
+
+COPY_1237 = """impl Solution {
+    pub fn find_solution(customfunction: &CustomFunction, z: i32) -> Vec<Vec<i32>> {
+        let mut result = vec![];
+        for x in 1..=1000 {
+            for y in 1..=1000 {
+                let g = customfunction.f(x, y);
+                if g == z { result.push(vec![x, y]); }
+                if g >= z { break; }
+            }
+        }
+        result
+    }
+}"""
+
+
+def test_copy_leaves_out_judge_types():
+    # CustomFunction is in the signature, the judge defines it
+    assert submission(solution_source("1237")) == (COPY_1237, [])
+
+
+def test_copy_keeps_helper_types():
+    source = """struct Parser { i: usize }
+
+impl Parser {
+    fn next(&mut self) -> usize { self.i += 1; self.i }
+}
+
+pub fn count(n: i32) -> i32 {
+    let mut p = Parser { i: 0 };
+    p.next() as i32 + n
+}
+
+fn main() {
+    test(count);
+}
+"""
+    code, _ = submission(source)
+    assert code.startswith("struct Parser { i: usize }\n\nimpl Parser {")
+    assert "impl Solution {\n    pub fn count(n: i32) -> i32 {" in code
+
+
+def test_corpus_matches_snapshots():
+    path = os.path.join(leetcode.BENCH_DIR, "snapshots.json")
+    with open(path, "r", encoding="utf-8") as f:
+        stored = json.load(f)
+    details = leetcode.load_corpus(leetcode.CORPUS_DIR, 0)
+    assert details
+    for name, detail in details:
+        assert leetcode.snapshot(detail) == stored[name], name
@@ -0,0 +1,99 @@
+"""checks of the shard layout migration on a copy of some solutions"""
+
+import os
+import shutil
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leetcode  # noqa: E402
+from leetcode import BinIndex, Layout, ProblemDetail, migrate_one  # noqa: E402
+
+SOURCE = """//! 两数之和
+
+pub fn two_sum(nums: Vec<i32>, target: i32) -> Vec<i32> {
+    let s = "fn main() {";
+    vec![nums.len() as i32, target]
+}
+
+fn main() {
+    assert_eq!(two_sum(vec![1], 2), vec![1, 2]);
+}
+"""
+
+
+def solutions(count):
+    """up to `count` solutions of the repo, in whichever layout it is"""
+    for folder in ("bin", "problems"):
+        path = os.path.join(leetcode.BASE_DIR, "src", folder)
+        if os.path.isdir(path):
+            names = sorted(i for i in os.listdir(path) if i.startswith("leetcode_"))
+            return [os.path.join(path, i) for i in names[:count]]
+    return []
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """a cargo project in tmp_path with the solutions in src/bin"""
+    shutil.copy(os.path.join(leetcode.BASE_DIR, "Cargo.toml"), tmp_path)
+    bin_dir = tmp_path / "src" / "bin"
+    bin_dir.mkdir(parents=True)
+    (bin_dir / "leetcode_1.rs").write_text(SOURCE, encoding="utf-8")
+    for path in solutions(40):
+        shutil.copy(path, bin_dir)
+    monkeypatch.setattr(Layout, "manifest", str(tmp_path / "Cargo.toml"))
+    monkeypatch.setattr(Layout, "problems_dir", str(tmp_path / "src" / "problems"))
+    monkeypatch.setattr(Layout, "tests_dir", str(tmp_path / "tests"))
+    monkeypatch.setattr(BinIndex, "bin_dir", str(bin_dir))
+    monkeypatch.setattr(BinIndex, "path", str(tmp_path / "bin_index.json"))
+    # cli() points bin_index at the layout directory, undone with the rest
+    monkeypatch.setattr(leetcode.bin_index, "bin_dir", str(bin_dir), raising=False)
+    monkeypatch.setattr(leetcode.bin_index, "entries", None)
+    monkeypatch.setattr(leetcode, "layout", Layout())
+    monkeypatch.setattr(leetcode, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def files(path):
+    return {i.name: i.read_bytes() for i in path.iterdir()}
+
+
+def test_migrate_one_round_trip(tmp_path):
+    src, mid, back = (tmp_path / i for i in ("a.rs", "b.rs", "c.rs"))
+    src.write_text(SOURCE, encoding="utf-8")
+    assert migrate_one((str(src), str(mid), True)) is None
+    assert "\n#[test]\nfn main() {" in mid.read_text("utf-8")
+    assert not src.exists()
+    assert migrate_one((str(mid), str(back), False)) is None
+    assert back.read_text("utf-8") == SOURCE
+
+
+def test_migrate_and_back_is_byte_identical(project):
+    before = files(project / "src" / "bin")
+    manifest = (project / "Cargo.toml").read_bytes()
+    runner = CliRunner()
+    result = runner.invoke(leetcode.cli, ["migrate", "--shards", "4", "--no-check"])
+    assert result.exit_code == 0, result.output
+    assert sorted(os.listdir(project / "src" / "problems")) == sorted(before)
+    assert sorted(os.listdir(project / "tests")) == [f"shard_{n}.rs" for n in range(4)]
+    assert "shards = 4" in (project / "Cargo.toml").read_text("utf-8")
+    result = runner.invoke(leetcode.cli, ["migrate", "--shards", "0"])
+    assert result.exit_code == 0, result.output
+    assert files(project / "src" / "bin") == before
+    assert (project / "Cargo.toml").read_bytes() == manifest
+    assert not os.listdir(project / "src" / "problems")
+    assert not os.listdir(project / "tests")
+
+
+@pytest.mark.parametrize("shards", [0, 4])
+def test_only_the_shard_layout_keeps_templates_pending(project, monkeypatch, shards):
+    monkeypatch.setattr(leetcode, "generations", leetcode.Generations())
+    leetcode.layout.shards = shards
+    detail = ProblemDetail("2", "两数相加", "", {"rust": ""})
+    path = project / "src" / "bin" / "leetcode_2.rs"
+    leetcode.write_rendered(str(path), SOURCE, {}, detail)
+    assert path.read_text("utf-8") == SOURCE
+    assert leetcode.layout.pending == ({"2"} if shards else set())
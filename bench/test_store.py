@@ -0,0 +1,146 @@
+"""checks of the sqlite store sync and the search index delta segment, with the
+network calls replaced by a fake problemset"""
+
+import json
+import os
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import leetcode  # noqa: E402
+from leetcode import Catalog, Problem, ResponseCache, SearchIndex, Store  # noqa: E402
+
+RUST = "impl Solution {\n    pub fn f(n: i32) -> i32 {\n\n    }\n}"
+
+
+def question(n, title=None):
+    return {
+        "frontendQuestionId": str(n),
+        "title": title or f"word{n}",
+        "titleSlug": f"slug-{n}",
+        "titleCn": f"题目{n}",
+        "difficulty": "EASY",
+        "topicTags": [{"name": "Array", "nameTranslated": "数组"}],
+    }
+
+
+def detail(slug, content="<p>plain</p>"):
+    return {
+        "questionFrontendId": slug.removeprefix("slug-"),
+        "translatedTitle": f"题目 {slug}",
+        "translatedContent": content,
+        "codeDefinition": json.dumps([{"value": "rust", "defaultCode": RUST}]),
+        "metaData": "{}",
+        "exampleTestcases": "1",
+        "topicTags": [],
+    }
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """[catalog questions], [requested slugs], data under tmp_path"""
+    questions = [question(n) for n in range(1, 61)]
+    fetched = []
+
+    def page(keyword="", skip=0, limit=50):
+        return {
+            "questions": questions[skip : skip + limit],
+            "total": len(questions),
+            "hasMore": skip + limit < len(questions),
+        }
+
+    def question_data(slugs, batch_size=1, jobs=1):
+        fetched.extend(slugs)
+        return {slug: detail(slug) for slug in slugs}
+
+    monkeypatch.setattr(leetcode, "problemset_page", page)
+    monkeypatch.setattr(leetcode, "get_question_data", question_data)
+    monkeypatch.setattr(leetcode, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(leetcode, "cache", ResponseCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(Catalog, "path", str(tmp_path / "catalog.json"))
+    monkeypatch.setattr(Store, "path", str(tmp_path / "problems.sqlite3"))
+    monkeypatch.setattr(SearchIndex, "path", str(tmp_path / "search"))
+    return questions, fetched
+
+
+def test_sync_fetches_new_and_changed(site):
+    questions, fetched = site
+    runner = CliRunner()
+    result = runner.invoke(leetcode.cli, ["sync"])
+    assert result.exit_code == 0, result.output
+    assert len(fetched) == 60
+    assert "60 synced, 0 failed, 60 problems" in result.output
+    fetched.clear()
+    questions[4] = question(5, "renamed")
+    questions.append(question(61))
+    result = runner.invoke(leetcode.cli, ["sync"])
+    assert result.exit_code == 0, result.output
+    assert fetched == ["slug-5", "slug-61"]
+    details = Store().get(["slug-5", "slug-61", "missing"])
+    assert sorted(details) == ["slug-5", "slug-61"]
+    assert details["slug-61"].id == "61"
+
+
+def test_store_stale(site):
+    questions, _ = site
+    catalog = Catalog()
+    for data in questions[:3]:
+        catalog.add(Problem(data))
+    store = Store()
+    assert store.stale(catalog) == ["slug-1", "slug-2", "slug-3"]
+    for problem in catalog.by_slug.values():
+        store.put(problem, detail(problem.key))
+    store.commit()
+    assert store.stale(catalog) == []
+    catalog.add(Problem(dict(questions[1], difficulty="HARD")))
+    assert store.stale(catalog) == ["slug-2"]
+
+
+def save_catalog(questions):
+    catalog = Catalog()
+    for data in questions:
+        catalog.add(Problem(data))
+    catalog.save()
+
+
+def test_search_index_delta(site):
+    questions, _ = site
+    save_catalog(questions)
+    # every problem is new, past the delta limit, straight into main
+    assert SearchIndex().refresh() == 60
+    index = SearchIndex()
+    assert index.refresh() == 0
+    assert index.search("word7") == [(5, "slug-7")]
+
+    questions[6] = question(7, "rewritten")
+    save_catalog(questions)
+    leetcode.cache.set("question/slug-9", detail("slug-9", "<p>葡萄</p>"))
+    index = SearchIndex()
+    assert index.refresh() == 2
+    assert index.docs["slug-7"]["segment"] == "delta"
+    assert index.docs["slug-9"]["segment"] == "delta"
+
+    # the main segment is left as is, its stale postings of slug-7 are skipped
+    index = SearchIndex()
+    assert "slug-7" in index.postings("word7")[0]
+    assert index.search("word7") == []
+    assert index.search("rewritten") == [(5, "slug-7")]
+    assert index.search("葡萄") == [(1, "slug-9")]
+    assert len(index.search("数组")) == 60
+
+
+def test_search_index_merges_large_delta(site):
+    questions, _ = site
+    save_catalog(questions)
+    SearchIndex().refresh()
+    for n in range(51):
+        questions[n] = question(n + 1, f"again{n + 1}")
+    save_catalog(questions)
+    index = SearchIndex()
+    assert index.refresh() == 60
+    assert {i["segment"] for i in index.docs.values()} == {"main"}
+    assert index.load_delta() == {}
+    assert SearchIndex().search("again3") == [(5, "slug-3")]
@@ -1,69 +1,570 @@
 #!/usr/bin/env python3
+import hashlib
 import html
 import json
 import logging
 import os
+import random
 import re
+import threading
 import time
+import tracemalloc
 import warnings
+import zlib
 from ast import literal_eval
+from collections import Counter
+from datetime import datetime
+from fnmatch import fnmatch
 from pathlib import Path
 
 import click
-import pyperclip
-import requests
+
+# requests, pyperclip and concurrent.futures are imported where they are used,
+# so commands like copy and list start without paying for them
 
 logging.basicConfig(
     format="[%(asctime)s: %(levelname)s] %(message)s", level=logging.INFO
 )
 logger = logging.getLogger(__name__)
 
-session = requests.session()
-if os.path.exists("cookie"):
-    with open("cookie", "r", encoding="utf-8") as f:
-        cookie = f.read()
-        session.headers["cookie"] = cookie.strip()
+POOL_SIZE = 16
 
-graphql_url = "https://leetcode.cn/graphql/"
+site_url = "https://leetcode.cn"
+graphql_url = f"{site_url}/graphql/"
 
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, ".leetcode")
+TESTDATA_DIR = os.path.join(BASE_DIR, "testdata")
 
-def get_problem_detail(slug: str):
-    query = """
-      query getQuestionDetail($titleSlug: String!) {
-        question(titleSlug: $titleSlug) {
+
+class Span(object):
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        if self.profiler.enabled:
+            self.profiler.add(self.name, self.start, self.end, self.args)
+
+
+class Profiler(object):
+    """wall time spans per phase, kept as chrome trace complete events
+
+    off unless --profile is given, a span then costs one perf_counter pair.
+    spans carrying a `problem` arg are also summed per problem, network spans
+    name it by slug until `name` tells which problem a slug is.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.names = {}
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def add(self, name, start, end, args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def name(self, key, problem):
+        """sum the spans of `key`, e.g. a slug, under `problem`"""
+        if self.enabled:
+            self.names[key] = problem
+
+    def share(self, name, span, sizes):
+        """split a finished batch `span` over {problem: bytes} as consecutive
+        `name` events, so batched work shows up per problem"""
+        if not self.enabled or not sizes:
+            return
+        step = (span.end - span.start) / len(sizes)
+        for n, (problem, size) in enumerate(sizes.items()):
+            start = span.start + n * step
+            self.add(name, start, start + step, {"problem": problem, "bytes": size})
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events}, f, ensure_ascii=False)
+
+    def summary(self):
+        phases = {}
+        problems = {}
+        for event in self.events:
+            ms = event["dur"] / 1000
+            count, total, longest, size = phases.get(event["name"], (0, 0, 0, 0))
+            size += event["args"].get("bytes", 0)
+            phases[event["name"]] = (count + 1, total + ms, max(longest, ms), size)
+            problem = event["args"].get("problem")
+            if problem is not None:
+                problem = self.names.get(problem, problem)
+                times = problems.setdefault(problem, {})
+                times[event["name"]] = times.get(event["name"], 0) + ms
+        lines = [
+            f"{'phase':<12}{'count':>7}{'total ms':>11}{'max ms':>10}{'bytes':>11}"
+        ]
+        for name, (count, total, longest, size) in phases.items():
+            lines.append(
+                f"{name:<12}{count:>7}{total:>11.1f}{longest:>10.1f}{size:>11}"
+            )
+        if problems:
+            names = list(dict.fromkeys(k for i in problems.values() for k in i))
+            lines.append("")
+            lines.append(f"{'problem':<12}" + "".join(f"{i:>11}" for i in names))
+            for problem, times in problems.items():
+                lines.append(
+                    f"{problem:<12}"
+                    + "".join(f"{times.get(i, 0):>11.1f}" for i in names)
+                )
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+class RateLimiter(object):
+    """token bucket shared by every thread, `rate` requests per second
+
+    the rate halves on throttling and creeps back up to `max_rate` on success.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.1):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """take a token, return the seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            with profiler.span("throttle"):
+                time.sleep(wait)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = self.max_rate = rate
+
+    def slow_down(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+limiter = RateLimiter(rate=2, burst=4)
+
+
+class Transport(object):
+    """requests through the limiter, retrying connection errors, 429 and 5xx with
+    exponential backoff plus jitter, honoring Retry-After. the requests session
+    and the cookie are only set up by the first request"""
+
+    retry_status = {429, 500, 502, 503, 504}
+
+    def __init__(self, retries=5, backoff=0.5, max_backoff=60, timeout=30):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "malformed": 0,
+            "backoff": 0.0,
+        }
+        self.lock = threading.Lock()
+        self.pool_size = POOL_SIZE
+        self.session = None
+
+    def get_session(self):
+        if self.session is None:
+            with self.lock:
+                if self.session is None:
+                    import requests
+
+                    session = requests.session()
+                    if os.path.exists("cookie"):
+                        with open("cookie", "r", encoding="utf-8") as f:
+                            cookie = f.read()
+                            session.headers["cookie"] = cookie.strip()
+                    self.mount(session)
+                    self.session = session
+        return self.session
+
+    def mount(self, session):
+        import requests
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4, pool_maxsize=self.pool_size
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def resize(self, pool_size):
+        self.pool_size = pool_size
+        if self.session is not None:
+            self.mount(self.session)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    def delay(self, attempt, rsp):
+        retry_after = rsp is not None and rsp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                from email.utils import parsedate_to_datetime
+
+                try:
+                    at = parsedate_to_datetime(retry_after).timestamp()
+                    return min(self.max_backoff, max(0.0, at - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def attempt(self, method, url, kwargs):
+        """one try without waiting, return (response, error), error None when
+        the response is final"""
+        import requests
+
+        session = self.get_session()
+        self.count("requests")
+        rsp = None
+        payload = kwargs.get("json") or {}
+        args = {"url": url, "op": payload.get("operationName")}
+        slugs = payload_slugs(payload.get("variables"))
+        if len(slugs) == 1:
+            args["problem"] = slugs[0]
+        elif slugs:
+            args["slugs"] = slugs
+        try:
+            with profiler.span("request", **args) as span:
+                rsp = session.request(method, url, **kwargs)
+                span.args["status"] = rsp.status_code
+                span.args["bytes"] = len(rsp.content)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return None, e
+        if rsp.status_code not in self.retry_status:
+            error = "json" in kwargs and self.malformed(rsp)
+            if not error:
+                limiter.speed_up()
+                return rsp, None
+            self.count("malformed")
+            return rsp, error
+        if rsp.status_code == 429:
+            self.count("throttled")
+            limiter.slow_down()
+        return rsp, f"response code [{rsp.status_code}]"
+
+    @staticmethod
+    def malformed(rsp):
+        """why a 200 GraphQL response is unusable (an error page, a truncated
+        body), None if it is fine"""
+        if rsp.status_code != 200:
+            return None
+        try:
+            body = rsp.json()
+        except ValueError:
+            return "response is not json"
+        if not isinstance(body, dict) or not (body.get("data") or body.get("errors")):
+            return "response has neither data nor errors"
+        return None
+
+    def retry_delay(self, method, url, attempt, rsp, error):
+        delay = self.delay(attempt, rsp)
+        logger.warning(f"{method} {url} {error}, retry in {delay:.1f}s")
+        self.count("retries")
+        self.count("backoff", delay)
+        return delay
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            rsp, error = self.attempt(method, url, kwargs)
+            if error is None:
+                return rsp
+            if attempt == self.retries:
+                break
+            delay = self.retry_delay(method, url, attempt, rsp, error)
+            with profiler.span("backoff", url=url):
+                time.sleep(delay)
+        raise Exception(f"{method} {url} fail after {self.retries} retries: {error}")
+
+
+transport = Transport()
+
+
+class ResponseCache(object):
+    """on-disk cache of raw fetch results, one file per key named by its sha1
+
+    entries older than `ttl` seconds are refetched unless offline, the least
+    recently used files (by mtime, touched on every hit) are evicted once the
+    directory grows past `max_size` bytes.
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600, max_size=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = False
+        self.size = None
+        self.lock = threading.Lock()
+
+    def file(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest[:2], digest[2:] + ".json")
+
+    def get(self, key):
+        file = self.file(key)
+        try:
+            with open(file, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self.offline and time.time() - entry["time"] > self.ttl:
+            return None
+        os.utime(file)
+        return entry["data"]
+
+    def delete(self, key):
+        try:
+            os.unlink(self.file(key))
+        except OSError:
+            pass
+        self.size = None
+
+    def peek(self, key):
+        """cached data whatever its age, without counting as a use"""
+        try:
+            with open(self.file(key), "r", encoding="utf-8") as f:
+                return json.load(f)["data"]
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, data):
+        file = self.file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            entry = {"key": key, "time": time.time(), "data": data}
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, file)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(i.stat().st_size for i in self.entries())
+            else:
+                self.size += os.path.getsize(file)
+            if self.size > self.max_size:
+                self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [i for i in Path(self.path).glob("*/*.json")]
+
+    def evict(self):
+        files = sorted(
+            ((i.stat(), i) for i in self.entries()), key=lambda x: x[0].st_mtime
+        )
+        self.size = sum(st.st_size for st, _ in files)
+        for st, file in files:
+            if self.size <= self.max_size * 0.9:
+                break
+            file.unlink(missing_ok=True)
+            self.size -= st.st_size
+
+    def fetch(self, key, fetch):
+        """cached fetch(), an empty result (a contest not open yet) is not stored"""
+        data = self.get(key)
+        if data is None:
+            data = fetch()
+            if data:
+                self.set(key, data)
+        return data
+
+
+cache = ResponseCache(os.path.join(DATA_DIR, "cache"))
+
+
+def set_endpoint(url):
+    """point every request at another site, e.g. a local replay server"""
+    global site_url, graphql_url
+    site_url = url.rstrip("/")
+    graphql_url = f"{site_url}/graphql/"
+
+
+def cache_dirs():
+    if not os.path.isdir(cache.path):
+        return []
+    return [i for i in os.scandir(cache.path) if i.is_dir()]
+
+
+def check_online(url):
+    if cache.offline:
+        raise Exception(f"offline mode, {url} is not cached")
+
+
+def http_get(url, **kwargs):
+    check_online(url)
+    return transport.request("GET", url, **kwargs)
+
+
+def payload_slugs(variables):
+    """the problem slugs a GraphQL request asks for, aliased ones included"""
+    return [
+        v
+        for k, v in (variables or {}).items()
+        if k in ("titleSlug", "questionSlug") or re.fullmatch(r"s\d+", k)
+    ]
+
+
+def graphql_body(operation, rsp):
+    try:
+        body = rsp.json()
+    except ValueError:
+        raise Exception(f"graphql {operation} response is not json: {rsp.text[:200]}")
+    if not body.get("data"):
+        raise Exception(f"graphql {operation} fail: {body.get('errors')}")
+    return body
+
+
+DETAIL_BATCH = 10
+
+question_detail_fields = """
           content
           stats
           codeDefinition
           sampleTestCase
+          exampleTestcases
+          topicTags {
+            name
+            slug
+            translatedName
+          }
           enableRunCode
           metaData
           translatedTitle
           translatedContent
           questionFrontendId
-        }
-      }
-    """
-    payload = {
-        "query": query,
-        "variables": {"titleSlug": slug},
-        "operationName": "getQuestionDetail",
-    }
-    rsp = session.post(graphql_url, json=payload)
-    data = rsp.json()["data"]["question"]
+"""
+
+
+def parse_meta_data(meta_data):
+    try:
+        return json.loads(meta_data) if meta_data else None
+    except ValueError:
+        return None
+
+
+def problem_detail_from_question(data):
     if not data["codeDefinition"]:
         return None
     code = json.loads(data["codeDefinition"])
+    examples = data.get("exampleTestcases") or data.get("sampleTestCase")
     return ProblemDetail(
         data["questionFrontendId"],
         data["translatedTitle"],
         data["translatedContent"],
         {i["value"]: i["defaultCode"] for i in code},
+        [examples] if examples else None,
+        parse_meta_data(data.get("metaData")),
     )
 
 
-def get_problems(keyword="", skip=0, limit=50):
-    url = "https://leetcode.cn/graphql"
-    query = """
+def fetch_aliased(
+    operation, field, slugs, batch_size, jobs=1, variables=None, key=None
+):
+    """fetch `field` for many slugs, batch_size aliases per GraphQL document
+    and up to `jobs` documents at once
+
+    `field` refers to the slug as $slug, `variables` are shared by every alias
+    as {name: (graphql type, value)}. return {slug: raw field data}, a null
+    alias maps to None and a failed batch is logged and left out, so neither
+    sinks the other slugs. with `key(slug)` results go through the cache and
+    only misses are requested.
+    """
+    return run_async(
+        lambda client: client.fetch_aliased(
+            operation, field, slugs, batch_size, jobs, variables, key
+        )
+    )
+
+
+def get_question_data(slugs, batch_size=DETAIL_BATCH, jobs=1):
+    """return {slug: raw question detail}, None for unknown slugs"""
+    field = "question(titleSlug: $slug) {" + question_detail_fields + "}"
+    return fetch_aliased(
+        "getQuestionDetails",
+        field,
+        list(slugs),
+        batch_size,
+        jobs,
+        key=lambda slug: f"question/{slug}",
+    )
+
+
+def get_problem_details(slugs, batch_size=DETAIL_BATCH, jobs=1):
+    """return {slug: ProblemDetail}, None for slugs without a rust template"""
+    data = get_question_data(slugs, batch_size, jobs)
+    return {
+        slug: problem_detail_from_question(question) if question else None
+        for slug, question in data.items()
+    }
+
+
+question_detail_query = (
+    """
+      query getQuestionDetail($titleSlug: String!) {
+        question(titleSlug: $titleSlug) {"""
+    + question_detail_fields
+    + """        }
+      }
+    """
+)
+
+
+def get_problem_detail(slug: str):
+    return run_async(lambda client: client.get_problem_detail(slug))
+
+
+problemset_query = """
 query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {
   problemsetQuestionList(
     categorySlug: $categorySlug
@@ -85,25 +586,24 @@ query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $fi
       title
       titleCn
       titleSlug
+      topicTags {
+        name
+        nameTranslated
+        slug
+      }
     }
   }
 }
     """
-    payload = {
-        "query": query,
-        "variables": {
-            "categorySlug": "algorithms",
-            "skip": skip,
-            "limit": limit,
-            "filters": {},
-        },
-    }
-    if keyword:
-        payload["variables"]["filters"]["searchKeywords"] = str(keyword)
-    rsp = session.post(url, json=payload)
-    data = rsp.json()["data"]["problemsetQuestionList"]["questions"]
-    problem = [Problem(i) for i in data]
-    return {i.id: i for i in problem}
+
+
+def problemset_page(keyword="", skip=0, limit=50):
+    """return raw problemsetQuestionList: {hasMore, total, questions}"""
+    return run_async(lambda client: client.problemset_page(keyword, skip, limit))
+
+
+def get_problems(keyword="", skip=0, limit=50):
+    return run_async(lambda client: client.get_problems(keyword, skip, limit))
 
 
 def contest_problems(name: str):
@@ -120,13 +620,12 @@ def contest_problems(name: str):
         "contest_problems is deprecated, use contest_problems_graphql",
         DeprecationWarning,
     )
-    url = f"https://leetcode.cn/contest/api/info/{name}"
-    data = session.get(url).json()
+    url = f"{site_url}/contest/api/info/{name}"
+    data = http_get(url).json()
     return data["questions"]
 
 
-def contest_problems_graphql(name: str):
-    query = """
+panel_query = """
 query panelQuestionList($currentQuestionSlug: String!, $categorySlug: String, $envId: String, $envType: String, $filters: QuestionListFilterInput) {
   panelQuestionList(
     currentQuestionSlug: $currentQuestionSlug
@@ -158,31 +657,13 @@ query panelQuestionList($currentQuestionSlug: String!, $categorySlug: String, $e
   }
 }
     """
-    payload = {
-        "operationName": "panelQuestionList",
-        "query": query,
-        "variables": {
-            "currentQuestionSlug": "",
-            "envId": name,
-            "envType": "contest",
-        },
-    }
-    rsp = session.post(graphql_url, json=payload)
-    data = rsp.json()["data"]["panelQuestionList"]["questions"]
-    return data
 
 
-def season_problems(name: str):
-    """return list of {
-     'title': '补给马车',
-    'titleCn': '补给马车',
-    'titleSlug': 'hqCnmP',
-    'credit': 2,
-    'questionId': '1000560',
-    '__typename': 'ContestQuestionNode'
-    }"""
-    url = "https://leetcode.cn/graphql"
-    query = """query contestGroup($slug: String!) {
+def contest_problems_graphql(name: str):
+    return run_async(lambda client: client.contest_problems(name))
+
+
+contest_group_query = """query contestGroup($slug: String!) {
       contestGroup(slug: $slug) {
         title
         titleCn
@@ -212,64 +693,74 @@ def season_problems(name: str):
       }
     }
     """
-    payload = {
-        "operationName": "contestGroup",
-        "query": query,
-        "variables": {"slug": name},
-    }
-    rsp = session.post(url, json=payload)
-    data = rsp.json()["data"]["contestGroup"]["contests"]
-    questions = []
-    for ctx in data:
-        for question in ctx["questions"]:
-            question["contest_title"] = ctx["titleSlug"]
-            questions.append(question)
-    return questions
 
 
-def contest_problem_detail(name: str, title_slug: str):
-    warnings.warn("contest_problem_detail is deprecated", DeprecationWarning)
-    url = f"https://leetcode.cn/contest/{name}/problems/{title_slug}/"
-    rsp = session.get(
-        url,
-        allow_redirects=False,
-    )
-    if rsp.status_code != 200:
-        raise Exception(
-            f"problem detail response code [{rsp.status_code}] != 200: {rsp.text}"
-        )
-    lines = rsp.text.split("\n")
-    pid = (
-        [i for i in lines if "<h3>" in i][0]
-        .strip()
-        .removeprefix("<h3>")
-        .partition(".")[0]
-    )
-    title = (
-        [i for i in lines if "questionTitle: " in i][0]
-        .strip()
-        .removeprefix("questionTitle: ")
-        .strip("',")
-    )
-    codes_str = [i for i in lines if "codeDefinition: " in i][0].strip().removeprefix(
-        "codeDefinition: "
-    ).strip(",").replace("'", '"')[:-2] + "]"
-    codes = json.loads(codes_str)
-    content = literal_eval(
-        [i for i in lines if "questionContent: " in i][0]
-        .strip()
-        .removeprefix("questionContent: ")
-    )[0]
+def season_problems(name: str):
+    """return list of {
+     'title': '补给马车',
+    'titleCn': '补给马车',
+    'titleSlug': 'hqCnmP',
+    'credit': 2,
+    'questionId': '1000560',
+    '__typename': 'ContestQuestionNode'
+    }"""
+    return run_async(lambda client: client.season_problems(name))
+
+
+page_fields = ("<h3>", "questionTitle: ", "codeDefinition: ", "questionContent: ")
 
+
+def parse_contest_page(text: str):
+    """ProblemDetail from a contest problem page, one pass over its lines"""
+    found = {}
+    for line in text.split("\n"):
+        line = line.strip()
+        for field in page_fields:
+            if field not in found and line.startswith(field):
+                found[field] = line[len(field) :]
+                break
+        if len(found) == len(page_fields):
+            break
+    missing = [i for i in page_fields if i not in found]
+    if missing:
+        raise Exception(f"contest page without {', '.join(missing)}")
+    pid = found["<h3>"].partition(".")[0]
+    title = found["questionTitle: "].strip("',")
+    codes_str = found["codeDefinition: "].strip(",").replace("'", '"')[:-2] + "]"
+    codes = json.loads(codes_str)
+    content = literal_eval(found["questionContent: "])[0]
     return ProblemDetail(
         pid, title, content, {i["value"]: i["defaultCode"] for i in codes}
     )
 
 
-def contest_problem_detail_graphql(contest_slug, slug):
-    query = """
-query contestQuestion($contestSlug: String, $questionSlug: String) {
-  contestQuestion(contestSlug: $contestSlug, questionSlug: $questionSlug) {
+def contest_page_detail(name: str, title_slug: str):
+    """detail scraped from the contest page, for when GraphQL has nothing"""
+    url = f"{site_url}/contest/{name}/problems/{title_slug}/"
+
+    def fetch_page():
+        rsp = http_get(
+            url,
+            allow_redirects=False,
+        )
+        if rsp.status_code != 200:
+            raise Exception(
+                f"problem detail response code [{rsp.status_code}] != 200: {rsp.text}"
+            )
+        return rsp.text
+
+    return parse_contest_page(cache.fetch(f"page/{name}/{title_slug}", fetch_page))
+
+
+def contest_problem_detail(name: str, title_slug: str):
+    warnings.warn(
+        "contest_problem_detail is deprecated, use contest_page_detail",
+        DeprecationWarning,
+    )
+    return contest_page_detail(name, title_slug)
+
+
+contest_question_fields = """
     question {
       contentType
       status
@@ -295,114 +786,1112 @@ query contestQuestion($contestSlug: String, $questionSlug: String) {
       translatedTitle
       translatedContent
     }
-  }
-}
-        """
-    payload = {
-        "operationName": "contestQuestion",
-        "query": query,
-        "variables": {"contestSlug": contest_slug, "questionSlug": slug},
-    }
-    rsp = session.post(graphql_url, json=payload)
-    data = rsp.json()["data"]["contestQuestion"]["question"]
+"""
+
+
+def problem_detail_from_contest_question(data):
     return ProblemDetail(
         data["questionFrontendId"],
         data["translatedTitle"],
         data["translatedContent"],
         {i["langSlug"]: i["code"] for i in data["codeSnippets"]},
+        data.get("exampleTestcaseList"),
+        parse_meta_data(data.get("metaData")),
     )
 
 
-class Problem(object):
-    def __init__(self, leetcode_data):
-        self.id = leetcode_data["frontendQuestionId"].replace(" ", "_").lower()
-        self.title = leetcode_data["title"]
-        self.key = leetcode_data["titleSlug"]
-        self.ch_title = leetcode_data["titleCn"]
+contest_question_query = (
+    """
+query contestQuestion($contestSlug: String, $questionSlug: String) {
+  contestQuestion(contestSlug: $contestSlug, questionSlug: $questionSlug) {"""
+    + contest_question_fields
+    + """  }
+}
+        """
+)
 
 
-def trans_arg(arg: str, type: str, is_return: bool = False):
-    arg = arg.strip()
-    if "=" in arg:
-        arg = arg.partition("=")[2].strip()
-    if "char" in type:
-        arg = arg.replace('"', "'")
-    if type.startswith("Vec"):
-        if type == "Vec<String>" and not is_return:
-            return f"svec!{arg}"
-        elif type == "Vec<Vec<String>>":
-            return f"vec![" + arg[1:-1].replace("[", "svec![") + "]"
-        elif type == "Vec<Option<Rc<RefCell<TreeNode>>>>":
-            return "vec![" + arg[1:-1].replace("[", "tree![") + "]"
-        elif type == "Vec<Option<Box<ListNode>>>":
-            return "vec![" + arg[1:-1].replace("[", "link![") + "]"
-        else:
-            return arg.replace("[", "vec![")
-    elif type == "String":
-        return f"String::from({arg})"
-    elif type == "Option<Rc<RefCell<TreeNode>>>":
-        return "tree!" + arg
-    elif type == "Option<Box<ListNode>>":
-        return "link!" + arg
-    else:
-        return arg
+def contest_problem_detail_graphql(contest_slug, slug):
+    return run_async(lambda client: client.contest_problem_detail(contest_slug, slug))
 
 
-class ProblemDetail(object):
-    def __init__(self, question_id, ch_title, content, templates):
-        self.id = (
-            question_id.replace("面试题 ", "m")
-            .replace("剑指 ", "")
-            .replace(".", "_")
-            .replace(" ", "_")
-            .lower()
+def contest_problem_details_graphql(
+    contest_slug, slugs, batch_size=DETAIL_BATCH, jobs=1
+):
+    """batched contest_problem_detail_graphql, return {slug: ProblemDetail}"""
+    field = (
+        "contestQuestion(contestSlug: $contestSlug, questionSlug: $slug) {"
+        + contest_question_fields
+        + "}"
+    )
+    data = fetch_aliased(
+        "contestQuestions",
+        field,
+        list(slugs),
+        batch_size,
+        jobs,
+        {"contestSlug": ("String", contest_slug)},
+        key=lambda slug: f"contest/{contest_slug}/{slug}",
+    )
+    return {
+        slug: (
+            problem_detail_from_contest_question(question["question"])
+            if question and question.get("question")
+            else None
         )
-        self.ch_title = ch_title
-        self.content = content
-        self.templates = templates
-        self.unorder = "any order" in content
+        for slug, question in data.items()
+    }
 
-    def rust_template(self, cases=""):
-        code: str = self.templates["rust"]
-        lines = code.split("\n")
-        lines = [i.strip() for i in lines if not i.strip().startswith("//")]
-        main_use = []
-        if "impl Solution {" in lines:
-            lines.remove("impl Solution {")
-            lines.remove("}")
-        if "TreeNode" in code:
-            lines.insert(0, "use leetcode::treenode::TreeNode;")
-            main_use.append("use leetcode::tree;")
-            lines.insert(2, "")
-        if "ListNode" in code:
-            lines.insert(0, "use leetcode::linknode::ListNode;")
-            main_use.append("use leetcode::link;")
-            lines.insert(2, "")
-        if "svec![" in cases:
-            main_use.append("use leetcode::svec;")
-        if self.unorder:
-            main_use.append("use leetcode::unorder;")
-        return "\n".join(lines), "\n".join(main_use)
 
-    html_tag_re = re.compile("<[^<]+?>")
+class AsyncClient(object):
+    """asyncio api of the fetch functions, for scripts driving many fetches
 
-    def input_and_output(self):
-        content = self.content
-        lines = content.replace("：", ":").split("\n")
-        n = len(lines)
-        i = 0
-        inputs = []
-        outputs = []
+        async with AsyncClient(limit=8) as client:
+            details = await asyncio.gather(
+                *(client.get_problem_detail(slug) for slug in slugs)
+            )
 
-        def clean(line: str):
-            line = self.html_tag_re.sub("", line)
-            return (
-                line.replace("，", ", ")
-                .replace(" ", "")
-                .replace("输入:", "")
-                .replace("输出:", "")
-                .removeprefix(">")
-                .strip()
+    requests share the pooled session of `transport`, its limiter and retries,
+    at most `limit` are in flight at once. throttling and backoff waits are
+    asyncio sleeps, so a cancelled task stops at once, a request already on
+    the wire finishes in its thread and is dropped.
+    """
+
+    def __init__(self, limit=POOL_SIZE):
+        self.limit = limit
+        self.semaphore = None
+        self.executor = None
+
+    async def __aenter__(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.executor = ThreadPoolExecutor(self.limit, thread_name_prefix="fetch")
+        if transport.pool_size < self.limit:
+            transport.resize(self.limit)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def request(self, method, url, **kwargs):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        kwargs.setdefault("timeout", transport.timeout)
+        for attempt in range(transport.retries + 1):
+            wait = limiter.reserve()
+            if wait > 0:
+                with profiler.span("throttle"):
+                    await asyncio.sleep(wait)
+            async with self.semaphore:
+                rsp, error = await loop.run_in_executor(
+                    self.executor, transport.attempt, method, url, kwargs
+                )
+            if error is None:
+                return rsp
+            if attempt == transport.retries:
+                break
+            delay = transport.retry_delay(method, url, attempt, rsp, error)
+            with profiler.span("backoff", url=url):
+                await asyncio.sleep(delay)
+        raise Exception(
+            f"{method} {url} fail after {transport.retries} retries: {error}"
+        )
+
+    async def get(self, url, **kwargs):
+        check_online(url)
+        return await self.request("GET", url, **kwargs)
+
+    async def graphql(self, payload):
+        check_online(payload.get("operationName") or graphql_url)
+        rsp = await self.request("POST", graphql_url, json=payload)
+        return graphql_body(payload.get("operationName"), rsp)
+
+    async def cached(self, key, fetch):
+        """async cache.fetch, `fetch` is a coroutine function"""
+        data = cache.get(key)
+        if data is None:
+            data = await fetch()
+            if data:
+                cache.set(key, data)
+        return data
+
+    async def get_problem_detail(self, slug: str):
+        payload = {
+            "query": question_detail_query,
+            "variables": {"titleSlug": slug},
+            "operationName": "getQuestionDetail",
+        }
+
+        async def fetch():
+            return (await self.graphql(payload))["data"]["question"]
+
+        data = await self.cached(f"question/{slug}", fetch)
+        detail = problem_detail_from_question(data)
+        if detail:
+            profiler.name(slug, detail.id)
+        return detail
+
+    async def fetch_aliased(
+        self, operation, field, slugs, batch_size, jobs=1, variables=None, key=None
+    ):
+        """async fetch_aliased, the batches run concurrently"""
+        import asyncio
+
+        variables = variables or {}
+        result = {}
+        if key:
+            for slug in slugs:
+                data = cache.get(key(slug))
+                if data is not None:
+                    result[slug] = data
+            slugs = [i for i in slugs if i not in result]
+
+        semaphore = asyncio.Semaphore(max(jobs, 1))
+
+        async def fetch_batch(batch):
+            decls = [f"${k}: {t}" for k, (t, _) in variables.items()]
+            batch_vars = {k: v for k, (_, v) in variables.items()}
+            aliases = []
+            for n, slug in enumerate(batch):
+                decls.append(f"$s{n}: String!")
+                aliases.append(f"q{n}: " + field.replace("$slug", f"$s{n}"))
+                batch_vars[f"s{n}"] = slug
+            body = "\n".join(aliases)
+            query = f"query {operation}({', '.join(decls)}) {{\n{body}\n}}"
+            payload = {
+                "operationName": operation,
+                "query": query,
+                "variables": batch_vars,
+            }
+            try:
+                async with semaphore:
+                    with profiler.span("fetch", op=operation, slugs=batch) as span:
+                        rsp = await self.graphql(payload)
+            except Exception as e:
+                logger.error(f"{operation} batch {batch} fail: {e}")
+                return {}
+            data = rsp.get("data") or {}
+            if rsp.get("errors"):
+                logger.warning(f"{operation} partial errors: {rsp['errors']}")
+            part = {slug: data.get(f"q{n}") for n, slug in enumerate(batch)}
+            if profiler.enabled:
+                sizes = {}
+                for slug, item in part.items():
+                    question = (item or {}).get("question", item) or {}
+                    if question.get("questionFrontendId"):
+                        profiler.name(slug, file_id(question["questionFrontendId"]))
+                    text = json.dumps(item, ensure_ascii=False)
+                    sizes[slug] = len(text.encode("utf-8"))
+                profiler.share("alias", span, sizes)
+            if key:
+                for slug, item in part.items():
+                    if item is not None:
+                        cache.set(key(slug), item)
+            return part
+
+        batches = [slugs[i : i + batch_size] for i in range(0, len(slugs), batch_size)]
+        for part in await asyncio.gather(*(fetch_batch(i) for i in batches)):
+            result.update(part)
+        return result
+
+    async def problemset_page(self, keyword="", skip=0, limit=50):
+        payload = {
+            "query": problemset_query,
+            "variables": {
+                "categorySlug": "algorithms",
+                "skip": skip,
+                "limit": limit,
+                "filters": {},
+            },
+        }
+        if keyword:
+            payload["variables"]["filters"]["searchKeywords"] = str(keyword)
+        return (await self.graphql(payload))["data"]["problemsetQuestionList"]
+
+    async def get_problems(self, keyword="", skip=0, limit=50):
+        data = (await self.problemset_page(keyword, skip, limit))["questions"]
+        problem = [Problem(i) for i in data]
+        return {i.id: i for i in problem}
+
+    async def contest_problems(self, name: str):
+        payload = {
+            "operationName": "panelQuestionList",
+            "query": panel_query,
+            "variables": {
+                "currentQuestionSlug": "",
+                "envId": name,
+                "envType": "contest",
+            },
+        }
+
+        async def fetch():
+            data = (await self.graphql(payload))["data"]
+            return data["panelQuestionList"]["questions"]
+
+        return await self.cached(f"contest/{name}", fetch)
+
+    async def contest_problem_detail(self, contest_slug, slug):
+        payload = {
+            "operationName": "contestQuestion",
+            "query": contest_question_query,
+            "variables": {"contestSlug": contest_slug, "questionSlug": slug},
+        }
+
+        async def fetch():
+            return (await self.graphql(payload))["data"]["contestQuestion"]
+
+        data = await self.cached(f"contest/{contest_slug}/{slug}", fetch)
+        return problem_detail_from_contest_question(data["question"])
+
+    async def season_problems(self, name: str):
+        payload = {
+            "operationName": "contestGroup",
+            "query": contest_group_query,
+            "variables": {"slug": name},
+        }
+
+        async def fetch():
+            return (await self.graphql(payload))["data"]["contestGroup"]["contests"]
+
+        data = await self.cached(f"season/{name}", fetch)
+        questions = []
+        for ctx in data:
+            for question in ctx["questions"]:
+                question["contest_title"] = ctx["titleSlug"]
+                questions.append(question)
+        return questions
+
+
+class ClientLoop(object):
+    """one AsyncClient on a background event loop for the whole command
+
+    the sync fetch functions submit their coroutines to it, so a command
+    making many calls, a snipe polling the panel or a contest fetching its
+    questions, reuses one loop, executor and semaphore instead of setting
+    them up per call. started on first use, closed with the command.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.client = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = AsyncClient(max(transport.pool_size, POOL_SIZE))
+        asyncio.run_coroutine_threadsafe(self.client.__aenter__(), loop).result()
+        self.loop = loop
+        self.pid = os.getpid()
+
+    def run(self, call):
+        """run call(client) on the loop and wait for it"""
+        import asyncio
+
+        if threading.current_thread() is self.thread:
+            raise Exception("sync fetch api called on the client loop, await it")
+        with self.lock:
+            # a forked worker has the loop object but not its thread
+            if self.loop is None or self.pid != os.getpid():
+                self.start()
+        future = asyncio.run_coroutine_threadsafe(call(self.client), self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None or self.pid != os.getpid():
+            return
+        import asyncio
+
+        exit = self.client.__aexit__(None, None, None)
+        asyncio.run_coroutine_threadsafe(exit, loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join()
+        loop.close()
+
+
+client_loop = ClientLoop()
+
+
+def run_async(call):
+    """run call(client) on the command's client loop, behind the sync api.
+    inside a running loop use AsyncClient directly"""
+    return client_loop.run(call)
+
+
+class Problem(object):
+    def __init__(self, leetcode_data):
+        self.data = leetcode_data
+        self.id = leetcode_data["frontendQuestionId"].replace(" ", "_").lower()
+        self.title = leetcode_data["title"]
+        self.key = leetcode_data["titleSlug"]
+        self.ch_title = leetcode_data["titleCn"]
+        self.difficulty = leetcode_data.get("difficulty")
+        self.status = leetcode_data.get("status")
+
+    @property
+    def file_id(self):
+        return file_id(self.data["frontendQuestionId"])
+
+
+class Catalog(object):
+    """local index of the problemset: id -> slug, title, titleCn, difficulty, status
+
+    `sync` pages through problemsetQuestionList with hasMore/total, lookups are
+    dict hits. a stale catalog only fetches the tail pages where new problems
+    show up, `full=True` refetches everything (e.g. to refresh status). when
+    the total grew by more than the tail brought in, or a new problem shows
+    up before the tail, the incremental sync falls back to a full one.
+    """
+
+    path = os.path.join(DATA_DIR, "catalog.json")
+    max_age = 24 * 3600
+    page_size = 100
+
+    def __init__(self):
+        self.updated = 0
+        self.total = 0
+        self.problems = {}
+        self.by_slug = {}
+        self.by_ch_title = {}
+        self.synced = False
+        self.lock = threading.RLock()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.updated = data["updated"]
+            self.total = data["total"]
+            for question in data["questions"]:
+                self.add(Problem(question))
+
+    def add(self, problem: Problem):
+        self.problems[problem.id] = problem
+        self.by_slug[problem.key] = problem
+        if problem.ch_title:
+            # titles are not unique, keep every problem sharing one
+            same = self.by_ch_title.setdefault(problem.ch_title, [])
+            same[:] = [i for i in same if i.id != problem.id] + [problem]
+
+    def save(self):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        data = {
+            "updated": self.updated,
+            "total": self.total,
+            "questions": [i.data for i in self.problems.values()],
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @property
+    def stale(self):
+        return time.time() - self.updated > self.max_age
+
+    def sync(self, full=False):
+        skip = 0
+        known = set(self.problems)
+        if not full and known:
+            # new problems are usually appended to the end of the list, refetch
+            # the last known page as overlap in case the ordering shifted a little
+            skip = max(0, len(known) - self.page_size)
+        new = 0
+        while True:
+            page = problemset_page(skip=skip, limit=self.page_size)
+            for n, question in enumerate(page["questions"]):
+                problem = Problem(question)
+                if known and not full and problem.id not in known:
+                    if skip + n < len(known):
+                        # inserted before the tail, e.g. LCP after the numbered
+                        logger.info(f"catalog: new {problem.id} before the tail")
+                        return self.sync(full=True)
+                    new += 1
+                self.add(problem)
+            self.total = page["total"]
+            skip += len(page["questions"])
+            logger.info(f"catalog sync {skip}/{self.total}")
+            if not page["hasMore"] or not page["questions"]:
+                break
+        if known and not full and self.total - len(known) > new:
+            logger.info(
+                f"catalog: {self.total - len(known)} more problems, {new} in the "
+                "tail, full sync"
+            )
+            return self.sync(full=True)
+        self.updated = time.time()
+        self.synced = True
+        self.save()
+
+    def search(self, keyword):
+        if cache.offline:
+            return {}
+        problems = get_problems(keyword)
+        for problem in problems.values():
+            self.add(problem)
+        if problems:
+            self.save()
+        return problems
+
+    def refresh(self):
+        """incremental sync at most once per run, only for a non-empty catalog"""
+        if self.problems and not self.synced and not cache.offline:
+            self.sync()
+
+    def get(self, pid) -> Problem:
+        pid = str(pid).lower()
+        if not self.stale and pid in self.problems:
+            return self.problems[pid]
+        with self.lock:
+            if self.stale:
+                self.refresh()
+            if pid not in self.problems:
+                self.refresh()
+            if pid not in self.problems:
+                self.search(pid)
+            return self.problems.get(pid)
+
+
+def catalog_hash(problem: Problem):
+    """changes when the catalog entry of a problem changes in a way that may
+    come with a new detail"""
+    data = problem.data
+    fields = ("title", "titleCn", "difficulty", "paidOnly", "topicTags")
+    key = json.dumps([data.get(i) for i in fields], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def problem_detail_from_row(row):
+    return ProblemDetail(
+        row["id"],
+        row["ch_title"],
+        row["content"],
+        json.loads(row["templates"]),
+        json.loads(row["testcases"]),
+        parse_meta_data(row["meta_data"]),
+    )
+
+
+class Store(object):
+    """sqlite mirror of every problem detail, one row per slug
+
+    rows keep the catalog hash they were fetched under, `stale` compares it
+    against the current catalog so a sync only refetches new or changed
+    problems.
+    """
+
+    path = os.path.join(DATA_DIR, "problems.sqlite3")
+    version = 1
+    schema = """
+create table if not exists problems (
+    slug text primary key,
+    id text not null,
+    title text,
+    ch_title text,
+    difficulty text,
+    content text,
+    templates text,
+    meta_data text,
+    testcases text,
+    tags text,
+    catalog_hash text,
+    synced real
+);
+create index if not exists problems_id on problems (id);
+"""
+
+    def __init__(self):
+        import sqlite3
+
+        os.makedirs(DATA_DIR, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        if self.db.execute("pragma user_version").fetchone()[0] != self.version:
+            self.db.executescript("drop table if exists problems;")
+            self.db.execute(f"pragma user_version = {self.version}")
+        self.db.executescript(self.schema)
+
+    @classmethod
+    def open(cls):
+        """the store if a sync ever created it, else None"""
+        return cls() if os.path.exists(cls.path) else None
+
+    def hashes(self):
+        rows = self.db.execute("select slug, catalog_hash from problems")
+        return {row["slug"]: row["catalog_hash"] for row in rows}
+
+    def stale(self, catalog: Catalog):
+        """slugs of the catalog that are missing or fetched under another hash"""
+        hashes = self.hashes()
+        return [
+            slug
+            for slug, problem in catalog.by_slug.items()
+            if hashes.get(slug) != catalog_hash(problem)
+        ]
+
+    def put(self, problem: Problem, data):
+        """store a raw question detail fetched for `problem`"""
+        code = json.loads(data["codeDefinition"] or "[]")
+        examples = data.get("exampleTestcases") or data.get("sampleTestCase")
+        row = (
+            problem.key,
+            data["questionFrontendId"],
+            problem.title,
+            data["translatedTitle"],
+            problem.difficulty,
+            data["translatedContent"],
+            json.dumps({i["value"]: i["defaultCode"] for i in code}),
+            data.get("metaData"),
+            json.dumps([examples] if examples else None),
+            json.dumps(tag_names(data.get("topicTags")), ensure_ascii=False),
+            catalog_hash(problem),
+            time.time(),
+        )
+        with self.lock:
+            self.db.execute(
+                f"insert or replace into problems values ({', '.join('?' * len(row))})",
+                row,
+            )
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+
+    def get(self, slugs):
+        """{slug: ProblemDetail} of the stored slugs among `slugs`"""
+        slugs = list(slugs)
+        result = {}
+        for i in range(0, len(slugs), 500):
+            part = slugs[i : i + 500]
+            with self.lock:
+                rows = self.db.execute(
+                    "select * from problems where slug in "
+                    f"({', '.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+            for row in rows:
+                if json.loads(row["templates"]).get("rust"):
+                    result[row["slug"]] = problem_detail_from_row(row)
+        return result
+
+    def count(self):
+        return self.db.execute("select count(*) from problems").fetchone()[0]
+
+
+literal_token_re = re.compile(
+    r'\s*(?:\[([^\[\]"]*)\]|(\[)|(\])|(,)|("(?:[^"\\]|\\.)*")|([^\s,\[\]"]+))'
+)
+space_re = re.compile(r"\s")
+arg_name_re = re.compile(r"\s*[A-Za-z_]\w*\s*=(?!=)")
+float_types = {"f64", "f32"}
+
+
+class Flat(list):
+    """a list literal without nested lists or strings, split in one C call"""
+
+
+def parse_literal(text: str):
+    """parse a LeetCode literal in one pass: lists become python lists, strings
+    keep their quoted token and everything else (numbers, null, true) its text"""
+    root = []
+    stack = [root]
+    pos = 0
+    while True:
+        m = literal_token_re.match(text, pos)
+        if not m:
+            break
+        pos = m.end()
+        flat, open_, close, comma, string, atom = m.groups()
+        if flat is not None:
+            flat = flat.strip()
+            items = flat.split(",") if flat else []
+            if space_re.search(flat):
+                items = [i.strip() for i in items]
+            stack[-1].append(Flat(items))
+        elif open_:
+            stack[-1].append([])
+            stack.append(stack[-1][-1])
+        elif close:
+            if len(stack) == 1:
+                raise ValueError(f"unbalanced ] in {text[:50]}")
+            stack.pop()
+        elif not comma:
+            stack[-1].append(string or atom)
+    if text[pos:].strip() or len(stack) != 1 or len(root) != 1:
+        raise ValueError(f"bad literal {text[:50]}")
+    return root[0]
+
+
+def split_args(text: str):
+    """split "a = [1,2], b = "x,y"" into its top level values, names dropped"""
+    args = []
+    depth = 0
+    start = 0
+    pos = 0
+    while True:
+        m = literal_token_re.match(text, pos)
+        if not m:
+            break
+        pos = m.end()
+        if m.group(2):
+            depth += 1
+        elif m.group(3):
+            depth -= 1
+        elif m.group(4) and depth == 0:
+            args.append(text[start : m.start(4)])
+            start = pos
+    args.append(text[start:])
+    return [strip_arg_name(i) for i in args if i.strip()]
+
+
+def strip_arg_name(arg: str):
+    """drop the leading `name =` of an example value"""
+    m = arg_name_re.match(arg)
+    return (arg[m.end() :] if m else arg).strip()
+
+
+def rust_char(token: str):
+    c = json.loads(token)
+    return "'\\" + c + "'" if c in ("'", "\\") else f"'{c}'"
+
+
+def literal_emitter(type: str, is_return=False, top=True):
+    """compile a rust type into emit(value, out) that appends the rust expression
+    of a parsed literal to the list `out`. emit.verbatim marks types whose atoms
+    are written as is, so flat lists of them are joined without a python loop"""
+    type = type.strip()
+    verbatim = False
+    if type == "Option<Rc<RefCell<TreeNode>>>" or type == "Option<Box<ListNode>>":
+        macro = "tree![" if "TreeNode" in type else "link!["
+
+        def emit(value, out):
+            if not isinstance(value, Flat):
+                raise ValueError(f"{type} expects a flat list")
+            out.append(macro)
+            out.append(",".join(value))
+            out.append("]")
+
+    elif type.startswith("Vec<") and type.endswith(">"):
+        item_type = type[4:-1].strip()
+        svec = item_type == "String" and not is_return
+        item = literal_emitter(item_type, is_return, top=False)
+        prefix = "svec![" if svec else "vec!["
+
+        def emit(value, out):
+            if not isinstance(value, list):
+                raise ValueError(f"{type} expects a list")
+            out.append(prefix)
+            if item.verbatim and isinstance(value, Flat):
+                out.append(",".join(value))
+            else:
+                for n, v in enumerate(value):
+                    if n:
+                        out.append(",")
+                    item(v, out)
+            out.append("]")
+
+    elif type.startswith("Option<") and type.endswith(">"):
+        item = literal_emitter(type[7:-1], is_return, top=False)
+
+        def emit(value, out):
+            if value == "null":
+                out.append("None")
+                return
+            out.append("Some(")
+            item(value, out)
+            out.append(")")
+
+    else:
+        verbatim = type not in ("char", "String", "_") and type not in float_types
+
+        def emit(value, out):
+            if isinstance(value, list):
+                literal_emitter("Vec<_>", is_return, top)(value, out)
+            elif type == "char" and value.startswith('"'):
+                out.append(rust_char(value))
+            elif type == "String" and top and value.startswith('"'):
+                out.append(f"String::from({value})")
+            elif type in float_types and value.lstrip("-").isdigit():
+                out.append(value + ".0")
+            else:
+                out.append(value)
+
+    emit.verbatim = verbatim
+    return emit
+
+
+def trans_arg(arg: str, type: str, is_return: bool = False):
+    """LeetCode example value -> rust expression of `type`, raw text if unparsable"""
+    arg = strip_arg_name(arg)
+    try:
+        value = parse_literal(arg)
+    except ValueError as e:
+        logger.debug(f"keep {arg[:50]} as is: {e}")
+        return arg
+    out = []
+    try:
+        literal_emitter(type, is_return)(value, out)
+    except ValueError as e:
+        logger.debug(f"keep {arg[:50]} as is: {e}")
+        return arg
+    return "".join(out)
+
+
+DATA_INLINE_LIMIT = 4096
+data_scalar_types = {
+    "i32",
+    "i64",
+    "u32",
+    "u64",
+    "usize",
+    "isize",
+    "f32",
+    "f64",
+    "bool",
+    "char",
+    "String",
+}
+
+
+def data_expr(type: str):
+    """rust expression loading a side file as `type` ({} is the path literal),
+    None if the leetcode crate can't read that type at runtime"""
+    type = type.strip()
+    if type == "Option<Rc<RefCell<TreeNode>>>":
+        return "leetcode::treenode::leetcode_tree(include_str!({}))"
+    if type == "Option<Box<ListNode>>":
+        return (
+            "leetcode::linknode::vec_to_link("
+            "leetcode::data::parse(include_str!({})))"
+        )
+    inner = type
+    while inner.endswith(">") and inner.startswith(("Vec<", "Option<")):
+        inner = inner.partition("<")[2][:-1].strip()
+    if inner not in data_scalar_types:
+        return None
+    return f"leetcode::data::parse::<{type}>(include_str!({{}}))"
+
+
+class BinIndex(object):
+    """persisted index of the leetcode_*.rs solutions in `bin_dir`: id, path,
+    //! title, sha1, mtime
+
+    `refresh` stats every file in one scandir pass, only files whose mtime or
+    size changed are re-read. the sha1 lets `verify` reuse what it learned
+    about a file that didn't change. `exists` answers from the entries while
+    the directory mtime says no file came or went since the last refresh.
+    """
+
+    path = os.path.join(DATA_DIR, "bin_index.json")
+    bin_dir = os.path.join(BASE_DIR, "src", "bin")
+    version = 2
+
+    def __init__(self):
+        self.entries = None
+        self.dir_mtime = None
+        self.lock = threading.RLock()
+
+    def load(self):
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.version and data.get("dir") == self.bin_dir:
+                self.entries = data["files"]
+
+    def save(self):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        data = {
+            "version": self.version,
+            "dir": self.bin_dir,
+            "files": self.entries,
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def read_entry(path, st):
+        with open(path, "rb") as f:
+            content = f.read()
+        first_line = content.partition(b"\n")[0].decode("utf-8", "replace")
+        return {
+            "id": os.path.basename(path)[len("leetcode_") : -len(".rs")],
+            "title": (
+                first_line.strip("/! ").strip() if first_line.startswith("//!") else ""
+            ),
+            "sha1": hashlib.sha1(content).hexdigest(),
+            "mtime": st.st_mtime,
+            "size": st.st_size,
+        }
+
+    def refresh(self, force=False):
+        """sync with the directory, re-read changed files or all with `force`"""
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            changed = False
+            seen = set()
+            # taken before the scan, a file added meanwhile triggers another
+            self.dir_mtime = os.stat(self.bin_dir).st_mtime_ns
+            with os.scandir(self.bin_dir) as it:
+                for item in it:
+                    name = item.name
+                    if not (name.startswith("leetcode_") and name.endswith(".rs")):
+                        continue
+                    seen.add(name)
+                    st = item.stat()
+                    entry = self.entries.get(name)
+                    if (
+                        not force
+                        and entry
+                        and entry["mtime"] == st.st_mtime
+                        and entry["size"] == st.st_size
+                    ):
+                        continue
+                    self.entries[name] = self.read_entry(item.path, st)
+                    changed = True
+            for name in set(self.entries) - seen:
+                del self.entries[name]
+                changed = True
+            if changed:
+                self.save()
+            return self.entries
+
+    def exists(self, path):
+        """whether a solution file is there, looked up in the entries"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.bin_dir):
+            return os.path.exists(path)
+        with self.lock:
+            try:
+                mtime = os.stat(self.bin_dir).st_mtime_ns
+            except OSError:
+                return False
+            if self.entries is None or mtime != self.dir_mtime:
+                self.refresh()
+            return os.path.basename(path) in self.entries
+
+    def get(self, pid):
+        return self.refresh().get(f"leetcode_{pid}.rs")
+
+
+bin_index = BinIndex()
+
+
+class Layout(object):
+    """where the solutions live
+
+    by default every problem is a binary in src/bin. with `shards = N` under
+    [package.metadata.leetcode] in Cargo.toml they are modules in src/problems
+    whose fn main() is a #[test], spread by id hash over N test binaries
+    tests/shard_*.rs, so building and testing all of them links N executables
+    instead of thousands. solutions that do not compile, a freshly generated
+    one until it is solved, are listed as `pending` there and left out of the
+    shards so the rest still builds, verify adds them back once they pass.
+    """
+
+    manifest = os.path.join(BASE_DIR, "Cargo.toml")
+    problems_dir = os.path.join(BASE_DIR, "src", "problems")
+    tests_dir = os.path.join(BASE_DIR, "tests")
+    section = "[package.metadata.leetcode]"
+    section_re = re.compile(
+        r"\n*^\[package\.metadata\.leetcode\]\n(?:^(?!\[).*\n?)*", re.M
+    )
+    shards_re = re.compile(r"^shards\s*=\s*(\d+)", re.M)
+    pending_re = re.compile(r"^pending\s*=\s*\[(.*?)\]", re.M | re.S)
+    shard_file_re = re.compile(r"shard_(\d+)\.rs")
+
+    def __init__(self):
+        self.shards = 0
+        self.pending = set()
+        self.dirty = False
+
+    def load(self):
+        """read the layout from Cargo.toml, point bin_index at its directory"""
+        try:
+            with open(self.manifest, "r", encoding="utf-8") as f:
+                m = self.section_re.search(f.read())
+        except OSError:
+            m = None
+        shards = m and self.shards_re.search(m.group())
+        self.shards = int(shards.group(1)) if shards else 0
+        pending = m and self.pending_re.search(m.group())
+        pending = pending.group(1) if pending else ""
+        self.pending = set(re.findall(r'"([^"]*)"', pending))
+        bin_index.bin_dir = self.problems_dir if self.shards else BinIndex.bin_dir
+
+    def save(self, shards):
+        """record `shards` and the pending ids in Cargo.toml, 0 goes back to
+        binaries"""
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            text = self.section_re.sub("", f.read()).rstrip("\n") + "\n"
+        if shards:
+            text += f"\n{self.section}\nshards = {shards}\n"
+            if self.pending:
+                pending = sorted(self.pending, key=id_sort_key)
+                text += "pending = [\n" + "".join(f'  "{i}",\n' for i in pending)
+                text += "]\n"
+        write_text(self.manifest, text)
+        self.load()
+
+    def shard(self, pid):
+        return zlib.crc32(pid.encode("utf-8")) % self.shards
+
+    def names(self):
+        """{id: module name} of every solution, unique ascii identifiers"""
+        result = {}
+        names = set()
+        pids = sorted((i["id"] for i in bin_index.refresh().values()), key=id_sort_key)
+        for pid in pids:
+            name = "leetcode_" + re.sub(r"[^0-9A-Za-z_]", "_", pid)
+            while name in names:
+                name += "_"
+            names.add(name)
+            result[pid] = name
+        return result
+
+    def modules(self):
+        """[[(id, module name)]] per shard, pending solutions left out"""
+        result = [[] for _ in range(self.shards)]
+        if not self.shards:
+            return result
+        for pid, name in self.names().items():
+            if pid not in self.pending:
+                result[self.shard(pid)].append((pid, name))
+        return result
+
+    def write_binary(self, path, header, modules):
+        lines = [f"//! {header}, generated by leetcode.py", ""]
+        for pid, name in modules:
+            lines.append(f'#[path = "../src/problems/leetcode_{pid}.rs"]')
+            lines.append(f"mod {name};")
+        text = "\n".join(lines) + "\n"
+        if not os.path.exists(path) or Path(path).read_text("utf-8") != text:
+            write_text(path, text)
+
+    def write_shards(self):
+        """regenerate the shard test binaries whose module list changed and
+        remove those past the shard count"""
+        if not self.shards and not os.path.isdir(self.tests_dir):
+            return
+        os.makedirs(self.tests_dir, exist_ok=True)
+        for n, modules in enumerate(self.modules()):
+            path = os.path.join(self.tests_dir, f"shard_{n}.rs")
+            self.write_binary(path, f"shard {n} of {self.shards}", modules)
+        for item in os.scandir(self.tests_dir):
+            m = self.shard_file_re.fullmatch(item.name)
+            if m and int(m.group(1)) >= self.shards:
+                os.unlink(item.path)
+        self.dirty = False
+
+    def settle(self, release=False, target_dir=None):
+        """build the shards, move the solutions failing to compile to pending
+        until the rest builds, return ({id: errors}, {shard: other errors})"""
+        target_dir = target_dir or os.path.join(BASE_DIR, "target")
+        targets = [f"shard_{n}" for n in range(self.shards)]
+        broken = {}
+        while True:
+            self.write_shards()
+            _, errors, modules = cargo_build(targets, release, target_dir, "test")
+            new = {k: v for k, v in modules.items() if k not in self.pending}
+            if not errors or not new:
+                return broken, errors
+            # an error can hide those of later modules, build again without it
+            broken.update(new)
+            self.pending.update(new)
+            self.save(self.shards)
+
+    def close(self):
+        if self.dirty and self.shards:
+            self.save(self.shards)
+            self.write_shards()
+
+
+layout = Layout()
+
+
+def file_id(question_id: str):
+    """frontend question id -> id used in src/bin/leetcode_{id}.rs"""
+    return (
+        question_id.replace("面试题 ", "m")
+        .replace("剑指 ", "")
+        .replace(".", "_")
+        .replace(" ", "_")
+        .lower()
+    )
+
+
+class ProblemDetail(object):
+    def __init__(
+        self, question_id, ch_title, content, templates, testcases=None, meta=None
+    ):
+        """`testcases` are exampleTestcaseList style strings, one argument per
+        line, `meta` the parsed metaData, both optional"""
+        self.id = file_id(question_id)
+        self.ch_title = ch_title
+        self.content = content
+        self.templates = templates
+        self.testcases = testcases
+        self.meta = meta
+        self.unorder = "any order" in content
+
+    def rust_template(self, cases=""):
+        code: str = self.templates["rust"]
+        lines = code.split("\n")
+        lines = [i.strip() for i in lines if not i.strip().startswith("//")]
+        main_use = []
+        if "impl Solution {" in lines:
+            lines.remove("impl Solution {")
+            lines.remove("}")
+        if "TreeNode" in code:
+            lines.insert(0, "use leetcode::treenode::TreeNode;")
+            main_use.append("use leetcode::tree;")
+            lines.insert(2, "")
+        if "ListNode" in code:
+            lines.insert(0, "use leetcode::linknode::ListNode;")
+            main_use.append("use leetcode::link;")
+            lines.insert(2, "")
+        if "svec![" in cases:
+            main_use.append("use leetcode::svec;")
+        if self.unorder:
+            main_use.append("use leetcode::unorder;")
+        return "\n".join(lines), "\n".join(main_use)
+
+    html_tag_re = re.compile("<[^<]+?>")
+
+    def input_and_output(self, with_inputs=True):
+        """[(input, output)] scraped from the content, inputs are "" unless
+        `with_inputs`"""
+        content = self.content
+        lines = content.replace("：", ":").split("\n")
+        n = len(lines)
+        i = 0
+        inputs = []
+        outputs = []
+
+        def clean(line: str):
+            line = self.html_tag_re.sub("", line)
+            return (
+                line.replace("，", ", ")
+                .replace(" ", "")
+                .replace("输入:", "")
+                .replace("输出:", "")
+                .removeprefix(">")
+                .strip()
                 .strip("`")
             )
 
@@ -410,18 +1899,20 @@ class ProblemDetail(object):
             if "输入:" in lines[i]:
                 s = lines[i]
                 i += 1
-                while not ("输出" in lines[i] or lines[i] == "" or lines[i] == ">"):
+                while i < n and not (
+                    "输出" in lines[i] or lines[i] == "" or lines[i] == ">"
+                ):
                     line = lines[i]
-                    if " = " in line and s:
-                        s += ", "
-                    s += line
+                    if with_inputs:
+                        if " = " in line and s:
+                            s += ", "
+                        s += line
                     i += 1
-                s = clean(s)
-                inputs.append(s)
+                inputs.append(clean(s) if with_inputs else "")
             elif "输出:" in lines[i]:
                 s = lines[i]
                 i += 1
-                while not (lines[i] == "" or "解释" in lines[i]):
+                while i < n and not (lines[i] == "" or "解释" in lines[i]):
                     s += lines[i]
                     i += 1
                 outputs.append(clean(s))
@@ -436,7 +1927,8 @@ class ProblemDetail(object):
             result.append((i, o))
         return result
 
-    def rust_testcase(self):
+    def signature(self):
+        """(func line, func name, [arg type], return type) of the rust template"""
         code = self.templates["rust"]
         funcs = [i for i in code.split("\n") if i.strip().startswith("pub fn")]
         if len(funcs) > 1:
@@ -447,13 +1939,85 @@ class ProblemDetail(object):
         funcname = funcname.strip().removeprefix("pub fn").strip()
         args_type = [i.partition(":")[2].strip() for i in args.split(", ")]
         return_type = return_.partition("->")[2].strip().partition("{")[0].strip()
-        inputs_output = self.input_and_output()
+        return func, funcname, args_type, return_type
+
+    def examples(self, n):
+        """[[arg]] per example from the structured test cases, None when they
+        are missing or don't split into `n` arguments per example"""
+        params = (self.meta or {}).get("params")
+        if not self.testcases or not params or len(params) != n:
+            return None
+        result = []
+        for testcase in self.testcases:
+            lines = testcase.strip("\n").split("\n")
+            if len(lines) % n:
+                return None
+            result.extend(lines[i : i + n] for i in range(0, len(lines), n))
+        return result
+
+    def examples_hash(self):
+        """changes with anything the generated tests are made from"""
+        key = json.dumps(
+            [
+                self.templates.get("rust"),
+                self.testcases,
+                (self.meta or {}).get("params"),
+                self.input_and_output(),
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def arg_cases(self):
+        """[([(arg, type)], (output, return type))] for every example
+
+        inputs come from the structured test cases when they cover every
+        example of the content, the expected outputs are always scraped"""
+        _, _, args_type, return_type = self.signature()
+        examples = self.examples(len(args_type))
+        scraped = self.input_and_output(with_inputs=examples is None)
+        if examples is None or len(examples) < len(scraped):
+            if examples is not None:
+                scraped = self.input_and_output()
+            return [
+                (list(zip(split_args(i), args_type)), (o, return_type))
+                for i, o in scraped
+            ]
+        outputs = [o for _, o in scraped]
+        outputs += [""] * (len(examples) - len(outputs))
+        return [
+            (list(zip(args, args_type)), (o, return_type))
+            for args, o in zip(examples, outputs)
+        ]
+
+    def rust_testcase(self, data=None):
+        """test lines of fn main(). with a `data` dict, values longer than
+        DATA_INLINE_LIMIT go to {file name: text} in it and are loaded through
+        include_str! from testdata/ instead of being inlined"""
+        func, funcname, _, _ = self.signature()
         result = []
         cases = []
-        for i, o in inputs_output:
-            args = i.split(", ")
-            transed = [trans_arg(arg, type) for arg, type in zip(args, args_type)]
-            cases.append((f"{','.join(transed)}", trans_arg(o, return_type, True)))
+
+        def expr(arg, type, is_return=False):
+            if data is not None and len(arg) > DATA_INLINE_LIMIT:
+                template = data_expr(type)
+                text = strip_arg_name(arg).strip()
+                try:
+                    parse_literal(text)
+                except ValueError:
+                    template = None
+                if template:
+                    name = f"{self.id}_{len(data)}.txt"
+                    data[name] = text
+                    return template.format(json.dumps(f"../../testdata/{name}"))
+            return trans_arg(arg, type, is_return)
+
+        with profiler.span("parse", problem=self.id):
+            arg_cases = self.arg_cases()
+        with profiler.span("testcase", problem=self.id):
+            for args, (o, return_type) in arg_cases:
+                transed = [expr(arg, type) for arg, type in args]
+                cases.append((f"{','.join(transed)}", expr(o, return_type, True)))
         origin_func_args = "(" + func.partition("(")[2].partition("{")[0]
         result.append(f"fn test(func: fn{origin_func_args}) {{")
         for func_in, func_out in cases:
@@ -468,116 +2032,1448 @@ class ProblemDetail(object):
         return result
 
 
-BASE_DIR = os.path.dirname(os.path.realpath(__file__))
-
-
 @click.group()
-def cli():
+@click.option("--offline", is_flag=True, help="never touch the network, use cache only")
+@click.option(
+    "--cache-ttl", default=30.0, help="days before a cached response is refetched"
+)
+@click.option("--cache-size", default=200, help="cache size limit in MB")
+@click.option("--profile", is_flag=True, help="time every phase, print a summary")
+@click.option(
+    "--trace",
+    default=os.path.join(DATA_DIR, "trace.json"),
+    help="chrome trace file written with --profile",
+)
+@click.option("--cprofile", help="also dump main thread cProfile stats here")
+@click.option(
+    "--endpoint",
+    envvar="LEETCODE_ENDPOINT",
+    default=site_url,
+    help="site to talk to, e.g. a bench serve replay server",
+)
+def cli(offline, cache_ttl, cache_size, profile, trace, cprofile, endpoint):
     """generate leetcode rust problem file"""
+    set_endpoint(endpoint)
+    cache.offline = offline
+    cache.ttl = cache_ttl * 24 * 3600
+    cache.max_size = cache_size * 1024 * 1024
+    layout.load()
+    ctx = click.get_current_context()
+    ctx.call_on_close(generations.save)
+    ctx.call_on_close(layout.close)
+    ctx.call_on_close(client_loop.close)
+    if not (profile or cprofile):
+        return
+    profiler.enabled = True
+    if cprofile:
+        import cProfile
 
+        stats = cProfile.Profile()
+        stats.enable()
+    start = time.perf_counter()
 
-def write(filepath, detail: ProblemDetail):
-    with open(filepath, "w", encoding="utf-8") as f:
-        cases = ""
-        try:
-            cases = detail.rust_testcase()
-        except Exception as e:
-            logger.error(f"generate testcases fail: {e}")
-        f.write(f"//! {detail.ch_title}\n")
-        f.write("\n")
-        code, main_use = detail.rust_template("\n".join(cases))
-        f.write(code)
-        f.write("\n")
-        f.write("\n")
-        f.write("fn main() {\n")
-        f.write(main_use)
-        f.write("\n".join(cases))
-        f.write("\n")
-        f.write("}\n")
-    print(filepath)
-    time.sleep(1)
+    def report():
+        command = {"command": ctx.invoked_subcommand}
+        profiler.add("command", start, time.perf_counter(), command)
+        if cprofile:
+            stats.disable()
+            stats.dump_stats(cprofile)
+            logger.info(f"cProfile stats written to {cprofile}")
+        print(profiler.summary())
+        profiler.save(trace)
+        logger.info(f"trace written to {trace}, open it in chrome://tracing")
 
+    ctx.call_on_close(report)
 
-@cli.command()
-@click.option("-f", "--force", is_flag=True)
+
+@cli.result_callback()
+def report_transport(*args, **kwargs):
+    stats = transport.stats
+    if stats["retries"]:
+        logger.info(
+            f"{stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['throttled']} throttled, {stats['malformed']} malformed, "
+            f"{stats['backoff']:.1f}s backing off"
+        )
+
+
+trailing_comma_re = re.compile(r",([)\]}])")
+
+
+def main_hash(main: str):
+    """hash of a fn main() blind to formatting and to its #[test] in the shard
+    layout, running rustfmt or migrating is no edit"""
+    text = "".join(main.split()).removeprefix("#[test]")
+    text = trailing_comma_re.sub(r"\1", text)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Generations(object):
+    """examples hash and fn main() hash of the last generated tests per solution
+
+    every written problem is recorded, the records are merged into the file
+    when the command exits so `refresh` can tell changed upstream examples and
+    hand edited tests apart.
+    """
+
+    path = os.path.join(DATA_DIR, "generated.json")
+
+    def __init__(self):
+        self.recorded = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        data = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        with self.lock:
+            data.update(self.recorded)
+        return data
+
+    def record(self, pid, examples, main):
+        with self.lock:
+            self.recorded[pid] = {"examples": examples, "main": main_hash(main)}
+
+    def save(self):
+        if not self.recorded:
+            return
+        data = self.load()
+        with self.lock:
+            self.recorded = {}
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write_text(self.path, json.dumps(data))
+
+
+generations = Generations()
+
+
+def render_main(detail: ProblemDetail, cases, as_test=False):
+    """(solution code, fn main() running the `cases` test lines), main is a
+    #[test] `as_test`, for the shard layout"""
+    with profiler.span("template", problem=detail.id):
+        code, main_use = detail.rust_template("\n".join(cases))
+    main = f"fn main() {{\n{main_use}" + "\n".join(cases) + "\n}"
+    return code, "#[test]\n" + main if as_test else main
+
+
+def render(detail: ProblemDetail, data=None):
+    cases = ""
+    try:
+        cases = detail.rust_testcase(data)
+    except Exception as e:
+        logger.error(f"generate testcases fail: {e}")
+    code, main = render_main(detail, cases, layout.shards > 0)
+    return f"//! {detail.ch_title}\n\n{code}\n\n{main}\n"
+
+
+def write_text(filepath, text: str, problem=None):
+    """write through a temp file and rename, an interrupted run never leaves a
+    half written file behind"""
+    tmp = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    args = {"path": filepath, "bytes": len(text)}
+    if problem is not None:
+        args["problem"] = problem
+    try:
+        with profiler.span("write", **args):
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, filepath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_rendered(filepath, text: str, data, detail: ProblemDetail = None):
+    """write the solution file after the side files it includes, a rendered
+    `detail` is recorded in `generations`"""
+    pid = Path(filepath).stem.removeprefix("leetcode_")
+    problem = detail.id if detail else pid
+    if data:
+        os.makedirs(TESTDATA_DIR, exist_ok=True)
+    for name, content in data.items():
+        write_text(os.path.join(TESTDATA_DIR, name), content, problem)
+    write_text(filepath, text, problem)
+    layout.dirty = True
+    if detail:
+        if layout.shards:
+            # an unsolved template does not compile, keep it out of the shards
+            layout.pending.add(pid)
+        main = text[text.rindex("\nfn main() {") + 1 :]
+        generations.record(pid, detail.examples_hash(), main)
+
+
+def write(filepath, detail: ProblemDetail):
+    data = {}
+    write_rendered(filepath, render(detail, data), data, detail)
+
+
+def check_path(path, force):
+    if bin_index.exists(path):
+        if not force:
+            logger.error(f"path {path} exist")
+            return False
+        logger.warning(f"will replace {path}")
+    return True
+
+
+def resolve_pid(catalog: Catalog, pid: str, force):
+    """return (path, slug) to fetch or None if skipped, path is "" when only the
+    detail knows the file id"""
+    path = ""
+    if pid.startswith("https://leetcode.cn/problems/"):
+        slug = pid.removeprefix("https://leetcode.cn/problems/").strip("/")
+        problem = catalog.by_slug.get(slug)
+        if problem:
+            path = os.path.join(bin_index.bin_dir, f"leetcode_{problem.file_id}.rs")
+            if not check_path(path, force):
+                return None
+    else:
+        path = os.path.join(bin_index.bin_dir, f"leetcode_{pid}.rs")
+        if not check_path(path, force):
+            return None
+        problem = catalog.get(pid)
+        if not problem:
+            raise Exception(f"problem {pid} not found")
+        slug = problem.key
+    return path, slug
+
+
+def write_problem(path, detail: ProblemDetail, force):
+    """write a fetched detail, return the written path or None if skipped"""
+    if not detail:
+        logger.warning("get empty problem detail")
+        return None
+    if path == "":
+        path = os.path.join(bin_index.bin_dir, f"leetcode_{detail.id}.rs")
+        if not check_path(path, force):
+            return None
+    write(path, detail)
+    return path
+
+
+@cli.command()
+@click.option("-f", "--force", is_flag=True)
+@click.option("-j", "--jobs", default=1, help="requests and writes run concurrently")
+@click.option("--rate", default=2.0, help="max requests per second")
+@click.option("--batch", default=DETAIL_BATCH, help="problem details per request")
+@click.option("--remote", is_flag=True, help="fetch even what the local store has")
 @click.argument("pids", nargs=-1)
-def get(pids, force):
+def get(pids, force, jobs, rate, batch, remote):
+    from concurrent.futures import ThreadPoolExecutor
+
+    limiter.set_rate(rate)
+    transport.resize(max(jobs, POOL_SIZE))
+    catalog = Catalog()
+    pids = [i.strip() for i in pids]
+    results = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        resolved = {}
+        futures = [pool.submit(resolve_pid, catalog, pid, force) for pid in pids]
+        for pid, future in zip(pids, futures):
+            try:
+                target = future.result()
+            except Exception as e:
+                results[pid] = e
+                continue
+            if target:
+                resolved[pid] = target
+            else:
+                results[pid] = None
+        slugs = list(dict.fromkeys(slug for _, slug in resolved.values()))
+        store = None if remote else Store.open()
+        details = store.get(slugs) if store else {}
+        missing = [i for i in slugs if i not in details]
+        details.update(get_problem_details(missing, batch, jobs))
+        for pid, (path, slug) in resolved.items():
+            if slug in details:
+                results[pid] = pool.submit(write_problem, path, details[slug], force)
+            else:
+                results[pid] = Exception(f"fetch {slug} detail fail")
+    failed = 0
     for pid in pids:
-        pid = pid.strip()
+        result = results[pid]
+        if hasattr(result, "result"):
+            try:
+                result = result.result()
+            except Exception as e:
+                result = e
+        if isinstance(result, Exception):
+            logger.error(f"{pid}: {result}")
+            failed += 1
+        elif result:
+            print(result)
+    if failed:
+        logger.error(f"{failed}/{len(pids)} failed")
 
-        path = ""
-        if pid.startswith("https://leetcode.cn/problems/"):
-            slug = pid.removeprefix("https://leetcode.cn/problems/").strip("/")
+
+@cli.group("catalog")
+def catalog_group():
+    """local problemset index"""
+
+
+@catalog_group.command("sync")
+@click.option("--full", is_flag=True, help="refetch every page, not only new ones")
+def catalog_sync(full):
+    catalog = Catalog()
+    catalog.sync(full=full or not catalog.problems)
+    print(f"{len(catalog.problems)} problems in {catalog.path}")
+
+
+@cli.command()
+@click.option("--full", is_flag=True, help="refetch every detail, not only changed")
+@click.option("-j", "--jobs", default=4, help="requests run concurrently")
+@click.option("--rate", default=2.0, help="max requests per second")
+@click.option("--batch", default=DETAIL_BATCH, help="problem details per request")
+def sync(full, jobs, rate, batch):
+    """mirror every problem detail into the local sqlite store"""
+    limiter.set_rate(rate)
+    transport.resize(max(jobs, POOL_SIZE))
+    catalog = Catalog()
+    catalog.sync(full=True)
+    store = Store()
+    stored = store.hashes()
+    slugs = list(catalog.by_slug) if full else store.stale(catalog)
+    logger.info(f"{len(slugs)}/{len(catalog.by_slug)} problems new or changed")
+    for slug in slugs:
+        if full or slug in stored:
+            # the catalog changed, a cached detail may be outdated too
+            cache.delete(f"question/{slug}")
+    chunk = batch * jobs * 4
+    done = failed = 0
+    for n in range(0, len(slugs), chunk):
+        part = slugs[n : n + chunk]
+        data = get_question_data(part, batch, jobs)
+        for slug in part:
+            if data.get(slug):
+                store.put(catalog.by_slug[slug], data[slug])
+                done += 1
+            else:
+                failed += 1
+        # commit per chunk, an interrupted sync keeps what it fetched
+        store.commit()
+        logger.info(f"sync {n + len(part)}/{len(slugs)}")
+    print(f"{done} synced, {failed} failed, {store.count()} problems in {store.path}")
+
+
+def refresh_one(task):
+    """regenerate the tests of one solution, return (status, message, record),
+    record is (examples hash, fn main()) to remember as the last generation"""
+    path, detail, last, force, dry_run, as_test = task
+    try:
+        examples = detail.examples_hash()
+        if last and last["examples"] == examples and not force:
+            return "unchanged", "", None
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        mains = [
+            i for i in rust_items(source) if i["kind"] == "fn" and i["name"] == "main"
+        ]
+        if not mains:
+            return "failed", "no fn main()", None
+        old = mains[0]
+        data = {}
+        _, main = render_main(detail, detail.rust_testcase(data), as_test)
+        if main_hash(old["text"]) == main_hash(main):
+            return "unchanged", "", (examples, main)
+        if not force:
+            if not last:
+                return "untracked", "", None
+            if main_hash(old["text"]) != last["main"]:
+                return "edited", "", None
+        if dry_run:
+            return "refreshed", "", None
+        end = old["start"] + len(old["text"])
+        write_rendered(path, source[: old["start"]] + main + source[end:], data)
+        return "refreshed", "", (examples, main)
+    except Exception as e:
+        return "failed", str(e), None
+
+
+@cli.command()
+@click.option("-f", "--force", is_flag=True, help="also rewrite edited or untracked")
+@click.option("-j", "--jobs", default=os.cpu_count(), help="worker processes")
+@click.option("--batch", default=DETAIL_BATCH, help="problem details per request")
+@click.option("--remote", is_flag=True, help="fetch again, bypassing store and cache")
+@click.option("-n", "--dry-run", is_flag=True, help="only print what would change")
+@click.argument("pattern", default="*")
+def refresh(force, jobs, batch, remote, dry_run, pattern):
+    """regenerate the fn main() tests of solutions whose id matches PATTERN
+    when their upstream examples changed since the last generation
+
+    the solution code is never touched. tests edited by hand after they were
+    generated, or untracked because no generation was recorded, are skipped
+    unless forced. the details come from the local store and the response
+    cache, which keep what was fetched before, --remote drops the cached
+    responses of the matching problems and fetches them again to pick up
+    upstream changes.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    catalog = Catalog()
+    if not catalog.problems:
+        catalog.sync(full=True)
+    slug_of = {i.file_id: i.key for i in catalog.problems.values()}
+    pids = [i["id"] for i in bin_index.refresh().values() if fnmatch(i["id"], pattern)]
+    pids.sort(key=id_sort_key)
+    slugs = {pid: slug_of[pid] for pid in pids if pid in slug_of}
+    store = None if remote else Store.open()
+    details = store.get(slugs.values()) if store else {}
+    if remote:
+        for slug in slugs.values():
+            cache.delete(f"question/{slug}")
+    missing = [i for i in slugs.values() if i not in details]
+    if missing:
+        details.update(get_problem_details(missing, batch, 4))
+    last = generations.load()
+    tasks = [
+        (
+            os.path.join(bin_index.bin_dir, f"leetcode_{pid}.rs"),
+            details[slug],
+            last.get(pid),
+            force,
+            dry_run,
+            layout.shards > 0,
+        )
+        for pid, slug in slugs.items()
+        if details.get(slug)
+    ]
+    counts = Counter(unknown=len(pids) - len(tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(refresh_one, tasks, chunksize=16)
+        for (path, *_), (status, message, record) in zip(tasks, results):
+            counts[status] += 1
+            if status == "failed":
+                logger.warning(f"{path}: {message}")
+            elif status == "refreshed":
+                print(path)
+            if record:
+                generations.record(Path(path).stem.removeprefix("leetcode_"), *record)
+    print(", ".join(f"{n} {status}" for status, n in counts.items() if n))
+
+
+test_attr_re = re.compile(r"^#\[test\]\s*")
+
+
+def migrate_one(task):
+    """move one solution file, its fn main() made a #[test] `as_test` or a plain
+    main again, return the error message or None"""
+    src, dst, as_test = task
+    try:
+        with open(src, "r", encoding="utf-8") as f:
+            source = f.read()
+        for item in rust_items(source):
+            if item["kind"] == "fn" and item["name"] == "main":
+                main = test_attr_re.sub("", item["text"])
+                if as_test:
+                    main = "#[test]\n" + main
+                end = item["start"] + len(item["text"])
+                source = source[: item["start"]] + main + source[end:]
+                break
+        write_text(dst, source)
+        os.unlink(src)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+@cli.command()
+@click.option("--shards", default=16, help="test binaries, 0 goes back to src/bin")
+@click.option("-j", "--jobs", default=os.cpu_count(), help="worker processes")
+@click.option("--no-check", is_flag=True, help="do not build the shards")
+def migrate(shards, jobs, no_check):
+    """switch every solution to the layout with SHARDS test binaries
+
+    solutions become modules of src/problems with a #[test] fn main(), spread
+    over tests/shard_*.rs. 0 shards turns them back into binaries of src/bin,
+    another shard count only regenerates tests/shard_*.rs. the shards are
+    then built and solutions that do not compile are listed as pending in
+    Cargo.toml and left out of them, a rerun checks every solution again.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    src_dir = bin_index.bin_dir
+    dst_dir = Layout.problems_dir if shards else BinIndex.bin_dir
+    if src_dir != dst_dir:
+        names = sorted(bin_index.refresh())
+        exist = [i for i in names if os.path.exists(os.path.join(dst_dir, i))]
+        if exist:
+            raise click.ClickException(f"{', '.join(exist[:5])} exist in {dst_dir}")
+        os.makedirs(dst_dir, exist_ok=True)
+        tasks = [
+            (os.path.join(src_dir, i), os.path.join(dst_dir, i), shards > 0)
+            for i in names
+        ]
+        failed = 0
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            errors = pool.map(migrate_one, tasks, chunksize=32)
+            for (src, _, _), error in zip(tasks, errors):
+                if error:
+                    logger.error(f"{src}: {error}")
+                    failed += 1
+        print(f"moved {len(tasks) - failed}/{len(tasks)} to {dst_dir}")
+        if failed:
+            # keep the old layout, a rerun moves the rest
+            raise click.ClickException(f"{failed} failed, fix them and rerun")
+    layout.pending = set()
+    layout.save(shards)
+    layout.write_shards()
+    if not shards:
+        return
+    print(f"{shards} test binaries in {layout.tests_dir}, run them by cargo test")
+    if no_check:
+        return
+    try:
+        broken, errors = layout.settle()
+    except FileNotFoundError:
+        logger.warning("cargo not found, the shards are not checked")
+        return
+    for pid in sorted(broken, key=id_sort_key):
+        logger.warning(f"leetcode_{pid} does not compile, left out of the shards")
+        logger.debug(broken[pid])
+    if broken:
+        print(f"{len(broken)} pending in {layout.manifest}, verify adds them back")
+    for shard, error in errors.items():
+        logger.error(f"{shard} does not build:\n{error.strip()}")
+
+
+def id_sort_key(pid: str):
+    return (not pid.isdigit(), int(pid) if pid.isdigit() else 0, pid)
+
+
+def id_kind(pid: str):
+    if pid.isdigit():
+        return "problem"
+    if "contest" in pid:
+        return "contest"
+    return re.match(r"[a-z]*", pid).group() or "other"
+
+
+@cli.command("list")
+@click.option("-t", "--title", help="only titles containing this")
+@click.argument("pattern", default="*")
+def list_files(pattern, title):
+    """list local solutions whose id matches the glob PATTERN"""
+    entries = bin_index.refresh().values()
+    for entry in sorted(entries, key=lambda x: id_sort_key(x["id"])):
+        if fnmatch(entry["id"], pattern) and (not title or title in entry["title"]):
+            print(f"{entry['id']}\t{entry['title']}")
+
+
+@cli.command()
+def stats():
+    """count local solutions by kind"""
+    entries = bin_index.refresh().values()
+    kinds = Counter(id_kind(i["id"]) for i in entries)
+    size = sum(i["size"] for i in entries)
+    print(f"{len(entries)} files, {size / 1024 / 1024:.1f} MB")
+    for kind, count in kinds.most_common():
+        print(f"{kind}\t{count}")
+
+
+word_re = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+
+
+def terms(text: str):
+    """lowercase ascii words and the character bigrams of chinese runs"""
+    result = []
+    for word in word_re.findall(text.lower()):
+        if word[0] < "\u4e00":
+            result.append(word)
+        elif len(word) == 1:
+            result.append(word)
         else:
-            path = os.path.join(BASE_DIR, "src", "bin", f"leetcode_{pid}.rs")
-            if os.path.exists(path):
-                if not force:
-                    logger.error(f"path {path} exist")
-                    continue
-                else:
-                    logger.warning(f"will replace {path}")
-            problems = get_problems(pid)
-            problem = problems[str(pid)]
-            slug = problem.key
-        detail = get_problem_detail(slug)
-        if not detail:
-            logger.warning("get empty problem detail")
+            result.extend(map(str.__add__, word, word[1:]))
+    return result
+
+
+def tag_names(tags):
+    return [
+        name
+        for tag in tags or []
+        for name in (
+            tag.get("name"),
+            tag.get("translatedName"),
+            tag.get("nameTranslated"),
+        )
+        if name
+    ]
+
+
+class SearchIndex(object):
+    """inverted index over catalog titles and tags plus cached problem content
+
+    the main segment splits its postings into buckets by term hash, a query
+    only loads the buckets of its terms. problems whose sources (catalog
+    entry hash, inode and size of the cached detail) changed are re-indexed
+    into a small delta segment, their stale main postings are skipped at
+    query time. once the delta holds `merge_ratio` of the problems everything
+    is rebuilt into the main segment.
+    """
+
+    path = os.path.join(DATA_DIR, "search")
+    buckets = 256
+    version = 2
+    weights = {"title": 5, "tags": 3, "content": 1}
+    merge_ratio = 0.1
+
+    def __init__(self):
+        self.docs = {}
+        self.stamp = ""
+        self.loaded = {}
+        self.hashed = {}
+        self.delta = None
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.delta_path = os.path.join(self.path, "delta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["version"] == self.version:
+                self.docs = data["docs"]
+                self.stamp = data["stamp"]
+
+    def bucket(self, term):
+        n = self.hashed.get(term)
+        if n is None:
+            digest = hashlib.md5(term.encode("utf-8")).hexdigest()
+            n = self.hashed[term] = int(digest[:4], 16) % self.buckets
+        return n
+
+    def bucket_path(self, n):
+        return os.path.join(self.path, f"{n:02x}.json")
+
+    def load_json(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_json(self, path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            # dumps encodes in C, dump streams through the python encoder
+            f.write(json.dumps(data, ensure_ascii=False))
+        os.replace(tmp, path)
+
+    def postings(self, term):
+        """({slug: weight} of the main segment, {slug: weight} of the delta)"""
+        n = self.bucket(term)
+        if n not in self.loaded:
+            self.loaded[n] = self.load_json(self.bucket_path(n))
+        return self.loaded[n].get(term, {}), self.load_delta().get(term, {})
+
+    def load_delta(self):
+        if self.delta is None:
+            self.delta = self.load_json(self.delta_path)
+        return self.delta
+
+    def sources_stamp(self):
+        """changes whenever the catalog is saved or a cache entry is written,
+        cache hits only touch file mtimes and leave directories alone"""
+        stamps = []
+        for path in [Catalog.path, cache.path] + [i.path for i in cache_dirs()]:
+            try:
+                stamps.append(str(os.stat(path).st_mtime_ns))
+            except OSError:
+                stamps.append("-")
+        return hashlib.sha1(" ".join(stamps).encode("utf-8")).hexdigest()
+
+    def document(self, problem: Problem, detail):
+        """(doc, {term: weight}) of one problem"""
+        data = problem.data
+        tags = tag_names(data.get("topicTags") or (detail or {}).get("topicTags"))
+        doc = {
+            "id": problem.id,
+            "file_id": problem.file_id,
+            "title": problem.title,
+            "ch_title": problem.ch_title or "",
+            "tags": list(dict.fromkeys(tags)),
+        }
+        weights = Counter()
+        fields = {
+            "title": f"{problem.title} {problem.ch_title or ''} {problem.id}",
+            "tags": " ".join(tags),
+            "content": "",
+        }
+        if detail and detail.get("translatedContent"):
+            content = ProblemDetail.html_tag_re.sub(" ", detail["translatedContent"])
+            fields["content"] = html.unescape(content)
+        for field, text in fields.items():
+            weight = self.weights[field]
+            for term, count in Counter(terms(text)).items():
+                weights[term] += count * weight
+        return doc, weights
+
+    def refresh(self, rebuild=False):
+        """index problems whose catalog entry or cached detail changed, return
+        how many. nothing is read when no source changed since the last time"""
+        sources = self.sources_stamp()
+        if not rebuild and sources == self.stamp:
+            return 0
+        catalog = Catalog()
+        stamps = {}
+        for slug, problem in catalog.by_slug.items():
+            # a sync rewrites the whole catalog, only changed entries count
+            stamp = f"{problem.file_id} {catalog_hash(problem)}"
+            try:
+                st = os.stat(cache.file(f"question/{slug}"))
+                stamps[slug] = f"{stamp} {st.st_ino} {st.st_size}"
+            except OSError:
+                stamps[slug] = stamp
+        changed = {
+            slug: stamp
+            for slug, stamp in stamps.items()
+            if self.docs.get(slug, {}).get("stamp") != stamp
+        }
+        for slug in [i for i in self.docs if i not in catalog.by_slug]:
+            del self.docs[slug]
+        self.stamp = sources
+        os.makedirs(self.path, exist_ok=True)
+        in_delta = sum(1 for i in self.docs.values() if i["segment"] == "delta")
+        limit = max(50, len(catalog.by_slug) * self.merge_ratio)
+        merge = len(changed) + in_delta > limit
+        if rebuild or merge:
+            self.rebuild(catalog, stamps)
+        elif changed:
+            self.load_delta()
+            for postings in self.delta.values():
+                for slug in changed:
+                    postings.pop(slug, None)
+            for slug, stamp in changed.items():
+                doc, weights = self.index(catalog, slug, stamp, "delta")
+                for term, weight in weights.items():
+                    self.delta.setdefault(term, {})[slug] = weight
+            self.delta = {k: v for k, v in self.delta.items() if v}
+            self.save_json(self.delta_path, self.delta)
+        self.save_meta()
+        return len(self.docs) if rebuild or merge else len(changed)
+
+    def index(self, catalog, slug, stamp, segment):
+        detail = cache.peek(f"question/{slug}")
+        doc, weights = self.document(catalog.by_slug[slug], detail)
+        doc["stamp"] = stamp
+        doc["segment"] = segment
+        self.docs[slug] = doc
+        return doc, weights
+
+    def rebuild(self, catalog, stamps):
+        buckets = [{} for _ in range(self.buckets)]
+        for slug, stamp in stamps.items():
+            _, weights = self.index(catalog, slug, stamp, "main")
+            for term, weight in weights.items():
+                buckets[self.bucket(term)].setdefault(term, {})[slug] = weight
+        for n, postings in enumerate(buckets):
+            self.save_json(self.bucket_path(n), postings)
+        self.loaded = dict(enumerate(buckets))
+        self.delta = {}
+        self.save_json(self.delta_path, self.delta)
+
+    def save_meta(self):
+        data = {"version": self.version, "stamp": self.stamp, "docs": self.docs}
+        self.save_json(self.meta_path, data)
+
+    def search(self, query: str):
+        """[(score, slug)] of problems holding every term of `query`, best first"""
+        scores = None
+        for term in set(terms(query)):
+            main, delta = self.postings(term)
+            found = {}
+            for segment, postings in (("main", main), ("delta", delta)):
+                for slug, weight in postings.items():
+                    doc = self.docs.get(slug)
+                    if doc and doc["segment"] == segment:
+                        found[slug] = weight
+            if scores is None:
+                scores = found
+            else:
+                scores = {k: v + found[k] for k, v in scores.items() if k in found}
+            if not scores:
+                return []
+        scores = scores or {}
+        return sorted(((v, k) for k, v in scores.items()), key=lambda x: -x[0])
+
+
+@cli.command()
+@click.option("-n", "--limit", default=20, help="results shown")
+@click.option("--rebuild", is_flag=True, help="index everything again")
+@click.argument("query", nargs=-1, required=True)
+def search(limit, rebuild, query):
+    """find problems by title, tag or content words, offline"""
+    start = time.perf_counter()
+    index = SearchIndex()
+    updated = index.refresh(rebuild)
+    if updated:
+        logger.info(f"indexed {updated} problems")
+    results = index.search(" ".join(query))
+    graph = None
+    for score, slug in results[:limit]:
+        doc = index.docs[slug]
+        entry = bin_index.get(doc["file_id"])
+        local = "-"
+        if entry:
+            if graph is None:
+                graph = CrateGraph(os.path.join(BASE_DIR, "src"))
+            path = os.path.join(bin_index.bin_dir, f"leetcode_{doc['file_id']}.rs")
+            with open(path, "r", encoding="utf-8") as f:
+                local = ",".join(graph.deps(f.read()) or []) or "local"
+        tags = ",".join(doc["tags"][:4])
+        print(f"{doc['id']}\t{doc['ch_title'] or doc['title']}\t{tags}\t{local}")
+    print(
+        f"{len(results)} results in {(time.perf_counter() - start) * 1000:.0f}ms",
+    )
+
+
+@cli.command()
+@click.option(
+    "-s",
+    "--show",
+    type=click.Choice(["missing", "unaccepted", "extra", "none"]),
+    default="missing",
+    help="which list to print",
+)
+@click.option("-d", "--difficulty", help="only EASY, MEDIUM or HARD")
+@click.option("--free", is_flag=True, help="skip paid only problems")
+@click.option("-n", "--limit", default=20, help="list entries shown, 0 for all")
+@click.option("--sync", "sync_first", is_flag=True, help="update the catalog first")
+@click.argument("pattern", default="*")
+def todo(show, difficulty, free, limit, sync_first, pattern):
+    """join the catalog with local solutions whose id matches PATTERN"""
+    catalog = Catalog()
+    if sync_first or not catalog.problems:
+        catalog.sync(full=not catalog.problems)
+    local = {i["id"] for i in bin_index.refresh().values()}
+    difficulty = difficulty and difficulty.upper()
+    counts = {}
+    lists = {"missing": [], "unaccepted": [], "extra": []}
+    known = set()
+    for problem in catalog.problems.values():
+        pid = problem.file_id
+        known.add(pid)
+        if not fnmatch(pid, pattern):
             continue
-        if path == "":
-            path = os.path.join(BASE_DIR, "src", "bin", f"leetcode_{detail.id}.rs")
-            if os.path.exists(path):
-                if not force:
-                    logger.error(f"path {path} exist")
-                    return
-                else:
-                    logger.warning(f"will replace {path}")
-        write(path, detail)
+        if difficulty and problem.difficulty != difficulty:
+            continue
+        if free and problem.data.get("paidOnly"):
+            continue
+        row = counts.setdefault(problem.difficulty or "-", Counter())
+        row["total"] += 1
+        row["accepted"] += problem.status == "AC"
+        if pid in local:
+            row["local"] += 1
+            if problem.status != "AC":
+                lists["unaccepted"].append(problem)
+        else:
+            lists["missing"].append(problem)
+    lists["extra"] = sorted(
+        (i for i in local - known if fnmatch(i, pattern)), key=id_sort_key
+    )
+    print(f"{'difficulty':<12}{'total':>7}{'local':>7}{'accepted':>10}{'missing':>9}")
+    for name in ("EASY", "MEDIUM", "HARD", "-"):
+        row = counts.get(name)
+        if row:
+            missing = row["total"] - row["local"]
+            print(
+                f"{name:<12}{row['total']:>7}{row['local']:>7}"
+                f"{row['accepted']:>10}{missing:>9}"
+            )
+    print(
+        f"{len(lists['missing'])} missing, {len(lists['unaccepted'])} local but not"
+        f" accepted, {len(lists['extra'])} local files outside the catalog"
+    )
+    if show == "none":
+        return
+    items = lists[show]
+    if show != "extra":
+        items.sort(key=lambda x: id_sort_key(x.file_id))
+    for item in items[: limit or None]:
+        if show == "extra":
+            print(item)
+            continue
+        ac_rate = item.data.get("acRate")
+        rate = f"{ac_rate * 100:.0f}%" if isinstance(ac_rate, (int, float)) else "-"
+        paid = " paid" if item.data.get("paidOnly") else ""
+        print(
+            f"{item.file_id}\t{item.difficulty}\t{rate}\t{item.ch_title or item.title}"
+            f"{paid}"
+        )
 
 
 @cli.command()
-def fix_id():
-    for file in Path("src/bin/").glob("leetcode_*contest*.rs"):
+@click.option("-n", "--dry-run", is_flag=True, help="only print the renames")
+def fix_id(dry_run):
+    """rename contest files to their problem id, matched by the //! title"""
+    files = {}
+    for file in sorted(Path(bin_index.bin_dir).glob("leetcode_*contest*.rs")):
         with open(file, "r", encoding="utf-8") as f:
             first_line = f.readline()
-            ch_title = first_line.strip("/! ").strip()
-        problems = get_problems(ch_title)
-        problems = [v for k, v in problems.items() if v.ch_title == ch_title]
-        if problems:
-            problem = problems[0]
-            real_id = int(problem.id)
-            to = file.parent / f"leetcode_{real_id}.rs"
-            print(f"rename {file} -> {to}")
-            os.rename(file, to)
+            files[file] = first_line.strip("/! ").strip()
+    if not files:
+        return
+    catalog = Catalog()
+    if not catalog.problems:
+        catalog.sync(full=True)
+    elif any(i not in catalog.by_ch_title for i in files.values()):
+        catalog.refresh()
+    targets = {}
+    for file, ch_title in files.items():
+        problems = catalog.by_ch_title.get(ch_title)
+        if not problems:
+            logger.warning(f"{file}: {ch_title} not in catalog")
+            continue
+        if len(problems) > 1:
+            ids = ", ".join(i.file_id for i in problems)
+            logger.error(f"{file}: {ch_title} is the title of {ids}, skip")
+            continue
+        problem = problems[0]
+        targets.setdefault(file.parent / f"leetcode_{problem.file_id}.rs", []).append(
+            file
+        )
+    for to, sources in targets.items():
+        if len(sources) > 1:
+            logger.error(f"{', '.join(map(str, sources))} all map to {to}, skip")
+            continue
+        if to.exists():
+            logger.error(f"{to} exist, skip {sources[0]}")
+            continue
+        print(f"rename {sources[0]} -> {to}")
+        if not dry_run:
+            os.rename(sources[0], to)
+            layout.dirty = True
+
+
+def parse_start(value: str):
+    """unix timestamp, "HH:MM[:SS]" today or "YYYY-MM-DD HH:MM[:SS]" local time"""
+    if value.replace(".", "", 1).isdigit():
+        return float(value)
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%H:%M:%S", "%H:%M"):
+        try:
+            at = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if at.year == 1900:
+            at = datetime.combine(datetime.now().date(), at.time())
+        return at.timestamp()
+    raise click.BadParameter(f"unknown time format {value}")
+
+
+def wait_for_start(start, warm_interval=15.0, lead=0.5):
+    """keep the pooled HTTPS connection warm until `lead` seconds before start"""
+    while True:
+        remaining = start - lead - time.time()
+        try:
+            transport.request("HEAD", f"{site_url}/")
+        except Exception as e:
+            logger.warning(f"warm connection fail: {e}")
+        if remaining <= 0:
+            return
+        logger.info(f"{remaining:.0f}s to start")
+        time.sleep(max(0.0, min(warm_interval, start - lead - time.time())))
+
+
+def poll_contest_problems(name, poll, timeout):
+    """poll the panel every `poll` seconds until questions appear, up to `timeout`"""
+    deadline = time.monotonic() + timeout
+    max_backoff, transport.max_backoff = transport.max_backoff, poll
+    try:
+        while True:
+            try:
+                questions = contest_problems_graphql(name)
+            except Exception as e:
+                logger.debug(f"poll {name}: {e}")
+                questions = []
+            if questions:
+                return questions
+            if time.monotonic() > deadline:
+                raise Exception(f"contest {name} problems not open after {timeout}s")
+            time.sleep(poll)
+    finally:
+        transport.max_backoff = max_backoff
+
+
+def pipeline(items, stages, maxsize=4):
+    """run items through stages [(func, workers), ...], every stage in its own
+    threads with a bounded queue in between, yield the last stage's results as
+    they finish. a stage returning None or raising drops the item"""
+    import queue
+
+    done = object()
+    queues = [queue.Queue(maxsize) for _ in range(len(stages) + 1)]
+    lock = threading.Lock()
+
+    def feed():
+        for item in items:
+            queues[0].put(item)
+        queues[0].put(done)
+
+    def work(n, func, remaining):
+        source, sink = queues[n], queues[n + 1]
+        while True:
+            item = source.get()
+            if item is done:
+                source.put(done)
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        sink.put(done)
+                return
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error(f"{func.__name__}: {e}")
+                continue
+            if result is not None:
+                sink.put(result)
+
+    threading.Thread(target=feed, daemon=True).start()
+    for n, (func, workers) in enumerate(stages):
+        remaining = [workers]
+        for _ in range(workers):
+            thread = threading.Thread(target=work, args=(n, func, remaining))
+            thread.daemon = True
+            thread.start()
+    while True:
+        result = queues[-1].get()
+        if result is done:
+            return
+        yield result
+
+
+def render_job(job):
+    path, detail = job
+    data = {}
+    return path, render(detail, data), data, detail
+
+
+def write_job(job):
+    write_rendered(*job)
+    return job[0]
+
+
+def contest_pipeline(name, questions, jobs, batch=DETAIL_BATCH):
+    """fetch details `batch` questions per aliased request while earlier ones
+    render and write, yield (path, timings) per question, the seconds of its
+    detail, render and write stages and when it was on disk"""
+    prefix = name.replace("-", "_")
+    start = time.monotonic()
+
+    def fetch_batch(part):
+        slugs = {}
+        for question_number, question in part:
+            path = os.path.join(
+                bin_index.bin_dir, f"leetcode_{prefix}_q{question_number}.rs"
+            )
+            if bin_index.exists(path):
+                logger.error(f"path {path} exist")
+                continue
+            slugs[path] = question["titleSlug"]
+        t = time.monotonic()
+        details = contest_problem_details_graphql(name, list(slugs.values()), batch)
+        seconds = time.monotonic() - t
+        result = []
+        for path, slug in slugs.items():
+            if not details.get(slug):
+                logger.error(f"get {slug} detail fail")
+                continue
+            result.append((path, details[slug], {"detail": seconds}))
+        return result
+
+    def render_batch(part):
+        result = []
+        for path, detail, timings in part:
+            t = time.monotonic()
+            result.append((render_job((path, detail)), timings))
+            timings["render"] = time.monotonic() - t
+        return result
+
+    def write_batch(part):
+        result = []
+        for job, timings in part:
+            t = time.monotonic()
+            result.append((write_job(job), timings))
+            timings["write"] = time.monotonic() - t
+            timings["disk"] = time.monotonic() - start
+        return result
+
+    questions = list(enumerate(questions, 1))
+    batches = [questions[i : i + batch] for i in range(0, len(questions), batch)]
+    stages = [(fetch_batch, max(jobs, 1)), (render_batch, 1), (write_batch, 1)]
+    for part in pipeline(batches, stages):
+        yield from part
 
 
 @cli.command()
+@click.option("--at", "start_at", help="contest start time, snipe the problems at it")
+@click.option("--poll", default=0.2, help="seconds between panel polls after start")
+@click.option("--timeout", default=300.0, help="seconds to keep polling")
+@click.option("-j", "--jobs", default=4, help="concurrent detail fetches")
 @click.argument("name")
-def contest(name):
-    prefix = name.replace("-", "_")
-    for question in contest_problems_graphql(name):
-        detail = contest_problem_detail_graphql(name, question["titleSlug"])
-        question_number = question["questionNumber"]
-        path = os.path.join(BASE_DIR, "src", "bin",
-                            f"leetcode_{prefix}_q{question_number}.rs")
-        if os.path.exists(path):
-            logger.error(f"path {path} exist")
-            continue
-        write(path, detail)
+def contest(name, start_at, poll, timeout, jobs):
+    if not start_at:
+        for path, _ in contest_pipeline(name, contest_problems_graphql(name), jobs):
+            print(path)
+        return
+
+    start = parse_start(start_at)
+    limiter.set_rate(max(limiter.max_rate, 2 / poll))
+    wait_for_start(start)
+    timings = []
+    t = time.monotonic()
+
+    def stage(label):
+        nonlocal t
+        now = time.monotonic()
+        timings.append((label, now - t))
+        logger.info(f"{label}: {now - t:.3f}s")
+        t = now
+
+    questions = poll_contest_problems(name, poll, timeout)
+    stage("panel")
+    # one alias per request, up to `jobs` in flight, the first question renders
+    # while others fetch
+    for path, seconds in contest_pipeline(name, questions, jobs, 1):
+        print(path)
+        logger.info(
+            f"{os.path.basename(path)}: detail {seconds['detail']:.3f}s, "
+            f"render {seconds['render']:.3f}s, write {seconds['write']:.3f}s, "
+            f"on disk {seconds['disk']:.3f}s after the panel"
+        )
+    stage("detail, render and write")
+    total = sum(i for _, i in timings)
+    logger.info(
+        f"{time.time() - start:.3f}s after start, {total:.3f}s from panel poll to disk"
+    )
+
+
+def season_detail(season_name, question, details):
+    """GraphQL problem detail, else the contest question, else the page"""
+    slug = question["titleSlug"]
+    if details.get(slug):
+        return details[slug]
+    try:
+        detail = contest_problem_detail_graphql(question["contest_title"], slug)
+        if detail:
+            return detail
+    except Exception as e:
+        logger.debug(f"contestQuestion {slug}: {e}")
+    return contest_page_detail(f"season/{season_name}", slug)
 
 
 @cli.command()
+@click.option("-j", "--jobs", default=4, help="concurrent detail fetches")
+@click.option("--batch", default=DETAIL_BATCH, help="problem details per request")
 @click.argument("season_name")
-def season(season_name):
-    for question in season_problems(season_name):
-        detail = contest_problem_detail(f"season/{season_name}", question["titleSlug"])
-        contest_name = question["contest_title"].replace("-", "_")
-        path = os.path.join(
-            BASE_DIR, "src", "bin", f"leetcode_{contest_name}_{detail.id}.rs"
-        )
-        if os.path.exists(path):
-            logger.error(f"path {path} exist")
+def season(season_name, jobs, batch):
+    """every problem of a season group, fetched in batches across its contests"""
+
+    def fetch_batch(questions):
+        slugs = [i["titleSlug"] for i in questions]
+        details = get_problem_details(slugs, batch)
+        result = []
+        for question in questions:
+            try:
+                detail = season_detail(season_name, question, details)
+            except Exception as e:
+                logger.error(f"get {question['titleSlug']} detail fail: {e}")
+                continue
+            contest_name = question["contest_title"].replace("-", "_")
+            path = os.path.join(
+                bin_index.bin_dir, f"leetcode_{contest_name}_{detail.id}.rs"
+            )
+            if bin_index.exists(path):
+                logger.error(f"path {path} exist")
+                continue
+            result.append((path, detail))
+        return result
+
+    def render_batch(jobs):
+        return [render_job(i) for i in jobs]
+
+    def write_batch(jobs):
+        return [write_job(i) for i in jobs]
+
+    questions = season_problems(season_name)
+    batches = [questions[i : i + batch] for i in range(0, len(questions), batch)]
+    stages = [(fetch_batch, max(jobs, 1)), (render_batch, 1), (write_batch, 1)]
+    for paths in pipeline(batches, stages):
+        for path in paths:
+            print(path)
+
+
+def skip_string(source, i):
+    """index after the string literal whose opening quote is at i, raw or not"""
+    j = i - 1
+    while j >= 0 and source[j] == "#":
+        j -= 1
+    if j >= 0 and source[j] == "r":
+        end = source.find('"' + "#" * (i - 1 - j), i + 1)
+        return len(source) if end == -1 else end + i - j
+    i += 1
+    while i < len(source):
+        c = source[i]
+        if c == "\\":
+            i += 2
+        elif c == '"':
+            return i + 1
+        else:
+            i += 1
+    return len(source)
+
+
+def skip_comment(source, i):
+    """index after the line or (nested) block comment starting at i"""
+    if source.startswith("//", i):
+        end = source.find("\n", i)
+        return len(source) if end == -1 else end
+    level = 0
+    while i < len(source):
+        if source.startswith("/*", i):
+            level += 1
+            i += 2
+        elif source.startswith("*/", i):
+            level -= 1
+            i += 2
+            if level == 0:
+                break
+        else:
+            i += 1
+    return i
+
+
+item_re = re.compile(
+    r"(?:pub(?:\([^)]*\))?\s+)?(?:(?:const|async|unsafe|extern\s+\"[^\"]*\")\s+)*"
+    r"(fn|struct|enum|union|trait|impl|mod|use|const|static|type|macro_rules!)"
+    r"\s*(?:<[^{]*?>\s*)?(?:mut\s+)?(\w+)?"
+)
+impl_for_re = re.compile(r"\bfor\s+(\w+)")
+ident_re = re.compile(r"[A-Za-z_]\w*")
+
+
+def rust_items(source: str):
+    """split rust source into top level items in one brace and string aware pass
+
+    return [{kind, name, start, text, idents}]. `text` includes the leading ///
+    docs and #[attributes], `idents` is every identifier in it. //! docs, #!
+    attributes and plain comments between items are dropped.
+    """
+    items = []
+    n = len(source)
+    i = 0
+    depth = 0
+    start = None  # first char of the current item, its docs and attributes included
+    head = None  # first char of the item itself
+    while i < n:
+        c = source[i]
+        if c == "/" and (source.startswith("//", i) or source.startswith("/*", i)):
+            if head is None and source.startswith("///", i):
+                if not source.startswith("////", i) and start is None:
+                    start = i
+            i = skip_comment(source, i)
+            continue
+        if c.isspace():
+            i += 1
+            continue
+        if head is None:
+            if c == "#":
+                inner = source.startswith("#!", i)
+                if start is None and not inner:
+                    start = i
+                level = 0
+                while i < n:
+                    if source[i] == '"':
+                        i = skip_string(source, i)
+                        continue
+                    if source[i] == "[":
+                        level += 1
+                    elif source[i] == "]":
+                        level -= 1
+                        if level == 0:
+                            i += 1
+                            break
+                    i += 1
+                continue
+            if start is None:
+                start = i
+            head = i
+            m = item_re.match(source, i)
+            kind = m.group(1) if m else None
+        if c == '"':
+            i = skip_string(source, i)
+            continue
+        if c == "'":
+            if source.startswith("\\", i + 1):
+                end = source.find("'", i + 3)
+                i = n if end == -1 else end + 1
+            elif i + 2 < n and source[i + 2] == "'":
+                i += 3
+            else:
+                i += 1
+            continue
+        if c in "{[(":
+            depth += 1
+        elif c in "}])":
+            depth -= 1
+        i += 1
+        if depth == 0 and (
+            c == ";" or c == "}" and kind not in ("use", "const", "static", "type")
+        ):
+            text = source[start:i]
+            name = m.group(2) if m else None
+            if kind == "impl":
+                header = source[head : source.find("{", head)]
+                for_type = impl_for_re.search(header)
+                name = for_type.group(1) if for_type else name
+            items.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "start": start,
+                    "text": text,
+                    "idents": sorted(set(ident_re.findall(text))),
+                }
+            )
+            start = head = None
+    return items
+
+
+extract_cache = ResponseCache(os.path.join(DATA_DIR, "extract"), ttl=float("inf"))
+
+
+def extract_items(source: str):
+    """rust_items cached by content hash"""
+    key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    return extract_cache.fetch(key, lambda: rust_items(source))
+
+
+def use_leaves(tree: str, parent=""):
+    """flatten a use tree into [(parent path, name)], e.g. "a::{b, c::d as e}" ->
+    [("a", "b"), ("a::c", "d as e")]"""
+    tree = tree.strip()
+    prefix, brace, rest = tree.partition("{")
+    if not brace:
+        path, _, name = tree.rpartition("::")
+        return [("::".join(i for i in (parent, path) if i), name)]
+    prefix = "::".join(i for i in (parent, prefix.strip().rstrip(":")) if i)
+    inner = rest.rpartition("}")[0]
+    leaves = []
+    level = 0
+    part = ""
+    for c in inner + ",":
+        if c == "," and level == 0:
+            if part.strip():
+                leaves.extend(use_leaves(part, prefix))
+            part = ""
             continue
-        write(path, detail)
+        level += c == "{"
+        level -= c == "}"
+        part += c
+    return leaves
+
+
+test_call_re = re.compile(r"(?<![\w.])test\((\w+)\)")
+type_kinds = ("struct", "enum", "union", "trait", "type", "impl")
+
+
+def submission(source: str, wanted_func=None, clip=""):
+    """the submission for a solution file: the problem function wrapped in `impl
+    Solution` plus the uses, constants, helpers and types it (transitively) needs
+
+    return (code, notes), notes are `leetcode::` uses to handle by hand
+    """
+    items = extract_items(source)
+    main = next((i for i in items if i["kind"] == "fn" and i["name"] == "main"), None)
+    if main is None:
+        raise Exception("unknown problem func name")
+    if "::new" in main["text"] and "fn check(" not in main["text"]:
+        code = source[: main["start"]]
+        return "\n".join(i for i in code.split("\n") if not i.startswith("//!")), []
+    funcs = {i["name"]: i for i in items if i["kind"] == "fn" and i is not main}
+    test_call = test_call_re.search(main["text"])
+    if test_call:
+        problem_func_name = test_call.group(1)
+    else:
+        called = [i for i in funcs if i in main["idents"]]
+        if not called:
+            raise Exception("unknown problem func name")
+        problem_func_name = called[0]
+    problem_funcs = [i for i in funcs if i.startswith(problem_func_name)]
+    if not wanted_func and clip in problem_funcs:
+        wanted_func = clip
+    if wanted_func:
+        wanted = [i for i in problem_funcs if i.endswith(wanted_func)]
+        if not wanted:
+            raise Exception(f"unknown func {wanted_func}")
+        func_name = wanted[0]
+    elif problem_func_name in funcs:
+        func_name = problem_func_name
+    else:
+        raise Exception(f"unknown func {problem_func_name}")
+
+    chosen = funcs[func_name]
+    # types in the signature (CustomFunction, Robot...) come with the judge,
+    # pasting the local stand-ins would define them twice
+    signature = chosen["text"][: chosen["text"].find("{")]
+    judge_types = set(ident_re.findall(signature))
+    named = {}
+    impls = {}
+    for item in items:
+        if item is main or item["kind"] == "use":
+            continue
+        if item["kind"] == "fn" and item["name"] in problem_funcs:
+            continue
+        if item["kind"] in type_kinds and item["name"] in judge_types:
+            continue
+        if item["kind"] == "impl":
+            impls.setdefault(item["name"], []).append(item)
+        else:
+            named.setdefault(item["name"], item)
+    needed = {id(chosen)}
+    queue = [chosen]
+    idents = set()
+    while queue:
+        item = queue.pop()
+        idents.update(item["idents"])
+        for ident in item["idents"]:
+            for dep in [named.get(ident)] + impls.get(ident, []):
+                if dep and id(dep) not in needed:
+                    needed.add(id(dep))
+                    queue.append(dep)
+
+    result = []
+    notes = []
+    for item in items:
+        if item["kind"] != "use":
+            continue
+        tree = item["text"].strip().rstrip(";").partition("use ")[2]
+        groups = {}
+        for parent, name in use_leaves(tree):
+            binding = name.rpartition(" as ")[2].strip()
+            if binding == "self":
+                binding = parent.rpartition("::")[2]
+            if binding != "*" and binding not in idents:
+                continue
+            if parent.split("::")[0] in ("leetcode", "crate"):
+                notes.append(f"{parent}::{name}")
+                continue
+            groups.setdefault(parent, []).append(name)
+        for parent, names in groups.items():
+            names = names[0] if len(names) == 1 else "{" + ", ".join(names) + "}"
+            result.append(f"use {parent}::{names};")
+    helpers = []
+    for item in items:
+        if id(item) not in needed or item is chosen:
+            continue
+        if item["kind"] in ("const", "static"):
+            result.append(item["text"])
+        else:
+            helpers.append(item["text"])
+    if helpers:
+        result.append("\n\n".join(helpers))
+    func_body = re.sub(rf"\b{func_name}\b", problem_func_name, chosen["text"])
+    result.append("impl Solution {")
+    result.extend(["    " + i if i else i for i in func_body.split("\n")])
+    result.append("}")
+    return "\n".join(result), notes
 
 
 @cli.command()
@@ -585,91 +3481,1024 @@ def season(season_name):
 @click.argument("filename")
 def copy(filename: str, wanted_func):
     if filename.isdigit():
-        filename = f"src/bin/leetcode_{filename}.rs"
+        filename = os.path.join(bin_index.bin_dir, f"leetcode_{filename}.rs")
     with open(filename, encoding="utf-8") as f:
         content = f.read()
-    content, _, main = content.partition("fn main(")
-    if "::new" in main and "fn check(" not in main:
-        pyperclip.copy(
-            "\n".join([i for i in content.split("\n") if not i.startswith("//!")])
-        )
-        return
-    problem_func_name = main.partition("    test(")[2].partition(")")[0]
-    if not problem_func_name:
-        print("unknown problem func name")
+    try:
+        import pyperclip
+
+        code, notes = submission(content, wanted_func, pyperclip.paste())
+    except Exception as e:
+        print(e)
         return
-    use = []
-    problem_funcs = {}
-    other_funcs = {}
-    in_func = False
-    cur_func = []
-    other = []
-    for line in content.split("\n"):
-        if in_func:
-            cur_func.append(line)
-            if line == "}":
-                func = "\n".join(cur_func)
-                func_name = (
-                    [i for i in cur_func if "fn " in i][0]
-                    .partition("(")[0]
-                    .partition("fn ")[2]
-                )
-                if func_name.startswith(problem_func_name):
-                    problem_funcs[func_name] = func
-                else:
-                    other_funcs[func_name] = func
-                cur_func = []
-                in_func = False
-        elif line and not line.startswith("//!"):
-            if line.startswith("use "):
-                use.append(line)
-            elif line.startswith("pub fn ") or line.startswith("fn "):
-                in_func = True
-                while other and other[-1].startswith("///"):
-                    cur_func.insert(0, other.pop())
-                cur_func.append(line)
-            else:
-                other.append(line)
+    for note in notes:
+        print(f"please handle use {note}")
+    pyperclip.copy(code)
 
-    clip = pyperclip.paste()
-    if not wanted_func and clip in problem_funcs:
-        wanted_func = clip
-    if wanted_func:
-        func_name, func_body = [
-            (k, v) for k, v in problem_funcs.items() if k.endswith(wanted_func)
-        ][0]
-    else:
-        func_name, func_body = problem_func_name, problem_funcs[problem_func_name]
+
+def export_one(task):
+    """write one submission, return the notes or the error message"""
+    src, dst = task
+    try:
+        with open(src, encoding="utf-8") as f:
+            code, notes = submission(f.read())
+    except Exception as e:
+        return str(e)
+    with open(dst, "w", encoding="utf-8") as f:
+        f.write(code)
+        f.write("\n")
+    return notes
+
+
+@cli.command()
+@click.option(
+    "-o", "--out", default=os.path.join(DATA_DIR, "export"), help="output directory"
+)
+@click.option("-j", "--jobs", default=os.cpu_count(), help="worker processes")
+@click.argument("pattern", default="*")
+def export(out, jobs, pattern):
+    """write the submission of every solution whose id matches PATTERN"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    entries = [i for i in bin_index.refresh().values() if fnmatch(i["id"], pattern)]
+    entries.sort(key=lambda x: id_sort_key(x["id"]))
+    os.makedirs(out, exist_ok=True)
+    tasks = [
+        (
+            os.path.join(bin_index.bin_dir, f"leetcode_{i['id']}.rs"),
+            os.path.join(out, f"leetcode_{i['id']}.rs"),
+        )
+        for i in entries
+    ]
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for (src, _), result in zip(tasks, pool.map(export_one, tasks, chunksize=32)):
+            if isinstance(result, str):
+                logger.debug(f"{src}: {result}")
+                failed += 1
+            elif result:
+                logger.warning(f"{src}: please handle use {', '.join(result)}")
+    print(f"exported {len(tasks) - failed}/{len(tasks)} to {out}")
+
+
+mod_re = re.compile(r"^\s*(?:pub\s+)?mod\s+(\w+)\s*;", re.M)
+crate_ref_re = re.compile(r"(?:\$crate|\bcrate|\bsuper)::(\w+)")
+leetcode_ref_re = re.compile(r"\bleetcode::(\{[^;]*|\w+)")
+include_re = re.compile(r'include_str!\("([^"]+)"\)')
+
+
+class CrateGraph(object):
+    """which files of the leetcode crate a solution depends on
+
+    modules are the `mod`s of lib.rs, a module depends on the modules it
+    names through crate:: or super::, a macro of lib.rs on the modules its
+    $crate:: paths name. a solution that mentions leetcode:: at all depends
+    on lib.rs itself.
+    """
+
+    def __init__(self, src_dir):
+        self.src_dir = src_dir
+        with open(os.path.join(src_dir, "lib.rs"), "r", encoding="utf-8") as f:
+            lib = f.read()
+        self.lib_sha1 = hashlib.sha1(lib.encode("utf-8")).hexdigest()
+        self.sha1 = {}
+        self.refs = {}
+        for name in mod_re.findall(lib):
+            path = os.path.join(src_dir, f"{name}.rs")
+            if not os.path.exists(path):
+                path = os.path.join(src_dir, name, "mod.rs")
+            with open(path, "r", encoding="utf-8") as f:
+                source = f.read()
+            self.sha1[name] = hashlib.sha1(source.encode("utf-8")).hexdigest()
+            self.refs[name] = set(crate_ref_re.findall(source))
+        self.macros = {}
+        for chunk in lib.split("macro_rules!")[1:]:
+            name = ident_re.match(chunk.strip()).group()
+            self.macros[name] = set(crate_ref_re.findall(chunk))
+        for name in self.refs:
+            self.refs[name] &= set(self.sha1)
+
+    def roots(self, source: str):
+        """names `source` takes from the crate, None if it doesn't use the crate"""
+        roots = set()
+        found = False
+        for m in leetcode_ref_re.finditer(source):
+            found = True
+            for parent, name in use_leaves(m.group(1)):
+                root = (parent or name).split("::")[0].split(" as ")[0].strip()
+                roots.add(root)
+                roots |= self.macros.get(root, set())
+        return sorted(roots) if found else None
+
+    def deps(self, source: str):
+        """the crate modules `source` depends on, None if it doesn't use the crate"""
+        return self.closure(self.roots(source))
+
+    def closure(self, roots):
+        """the crate modules `roots` depend on, directly or not"""
+        if roots is None:
+            return None
+        deps = set()
+        todo = [i for i in roots if i in self.sha1]
+        while todo:
+            name = todo.pop()
+            if name not in deps:
+                deps.add(name)
+                todo.extend(self.refs[name])
+        return sorted(deps)
+
+    def fingerprint(self, sha1, roots, *extra):
+        """hash of a file by its content `sha1`, everything of the crate its
+        `roots` depend on and `extra`"""
+        digest = hashlib.sha1(sha1.encode("utf-8"))
+        deps = self.closure(roots)
+        if deps is not None:
+            digest.update(f"lib.rs {self.lib_sha1}".encode("utf-8"))
+            for name in deps:
+                digest.update(f"{name} {self.sha1[name]}".encode("utf-8"))
+        for i in extra:
+            digest.update(str(i).encode("utf-8"))
+        return digest.hexdigest()
+
+
+problem_file_re = re.compile(r"src/problems/leetcode_(.+)\.rs")
+
+
+def cargo_build(bins, release, target_dir, kind="bin"):
+    """build `bins` in one cargo run, return ({bin: executable}, {bin: errors},
+    {id: errors}), with kind "test" they are test binaries of tests/ and the
+    last holds the errors located in a src/problems module"""
+    import subprocess
+
+    # cargo test takes no --keep-going, --no-fail-fast implies it
+    command = ["build", "--keep-going"]
+    if kind == "test":
+        command = ["test", "--no-run", "--no-fail-fast"]
+    args = ["cargo", *command, "--message-format=json"]
+    if release:
+        args.append("--release")
+    for name in bins:
+        args += [f"--{kind}", name]
+    env = dict(os.environ, CARGO_TARGET_DIR=target_dir)
+    rsp = subprocess.run(
+        args, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    built = {}
+    errors = {}
+    modules = {}
+    for line in rsp.stdout.decode("utf-8", "replace").split("\n"):
+        if not line.startswith("{"):
+            continue
+        message = json.loads(line)
+        target = message.get("target", {})
+        if kind not in target.get("kind", []):
+            continue
+        if message["reason"] == "compiler-artifact" and message.get("executable"):
+            built[target["name"]] = message["executable"]
+        elif message["reason"] == "compiler-message":
+            if message["message"]["level"] == "error":
+                rendered = message["message"]["rendered"]
+                errors[target["name"]] = errors.get(target["name"], "") + rendered
+                for span in message["message"]["spans"]:
+                    m = span["is_primary"] and problem_file_re.search(span["file_name"])
+                    if m:
+                        modules[m.group(1)] = modules.get(m.group(1), "") + rendered
+                        break
+    stderr = rsp.stderr.decode("utf-8", "replace").strip()
+    for name in bins:
+        if name not in built and name not in errors:
+            errors[name] = stderr.rpartition("\n")[2] or "not built"
+    return built, errors, modules
+
+
+def run_binary(job):
+    """(name, passed, seconds, output tail) of running one built solution"""
+    import subprocess
+
+    name, executable, timeout = job
+    start = time.perf_counter()
+    try:
+        rsp = subprocess.run(
+            [executable],
+            cwd=BASE_DIR,
+            env=dict(os.environ, RUST_BACKTRACE="0"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return name, False, time.perf_counter() - start, f"timeout after {timeout}s"
+    output = rsp.stdout.decode("utf-8", "replace").strip()
+    tail = "\n".join(output.split("\n")[-5:])
+    return name, rsp.returncode == 0, time.perf_counter() - start, tail
+
+
+test_result_re = re.compile(r"^test (\S+) \.\.\. (\w+)", re.M)
+
+
+def run_tests(job):
+    """[(name, passed, seconds, output tail)] of running the #[test] mains of
+    one shard test binary, `tests` maps test paths to solution names"""
+    import subprocess
+
+    shard, executable, tests, timeout = job
+    start = time.perf_counter()
+    try:
+        rsp = subprocess.run(
+            [executable, "--exact", *tests],
+            cwd=BASE_DIR,
+            env=dict(os.environ, RUST_BACKTRACE="0"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        tail = f"{shard} timeout after {timeout}s"
+        return [(i, False, time.perf_counter() - start, tail) for i in tests.values()]
+    seconds = (time.perf_counter() - start) / len(tests)
+    output = rsp.stdout.decode("utf-8", "replace")
+    status = dict(test_result_re.findall(output))
     result = []
-    for u in use:
-        if "leetcode::" in u:
-            print(f"please handle {u}")
+    for test, name in tests.items():
+        if status.get(test) == "ok":
+            result.append((name, True, seconds, ""))
             continue
-        prefix, _, names = u.rpartition("::")
-        names = [i.strip() for i in names.strip(";{}").split(",")]
-        used_names = [i for i in names if i in func_body]
-        if used_names:
-            used_names = (
-                used_names[0]
-                if len(used_names) == 1
-                else "{" + ", ".join(used_names) + "}"
+        if test not in status:
+            result.append((name, False, seconds, f"{test} not found in {shard}"))
+            continue
+        # the failure section of this test, else the end of the whole output
+        _, _, section = output.partition(f"---- {test} stdout ----\n")
+        lines = (section.partition("\n\n")[0] or output.strip()).split("\n")
+        result.append((name, False, seconds, "\n".join(lines[-5:])))
+    return result
+
+
+@cli.command()
+@click.option(
+    "-a", "--all", "everything", is_flag=True, help="ignore the last green run"
+)
+@click.option("-j", "--jobs", default=os.cpu_count(), help="binaries run concurrently")
+@click.option("--shard", default=64, help="binaries per cargo build")
+@click.option("--release", is_flag=True, help="build with optimizations")
+@click.option("--timeout", default=60.0, help="seconds a binary may run")
+@click.option("--target-dir", help="cargo target dir shared by every shard")
+@click.option("-n", "--dry-run", is_flag=True, help="only print what would run")
+@click.argument("pattern", default="*")
+def verify(everything, jobs, shard, release, timeout, target_dir, dry_run, pattern):
+    """build and run the solutions whose id matches PATTERN and that changed
+
+    a solution is unchanged when neither it nor the leetcode modules it uses
+    changed since it last passed. shards build one after another in a shared
+    target dir while the binaries of finished shards run in parallel. in the
+    shard layout the test binaries holding the solutions are built and run
+    with only the selected tests, selected pending solutions go into a
+    tests/pending.rs of their own and back into the shards when they pass. a
+    solution breaking the build of its shard is made pending and the shard
+    built again for the others.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    state_path = os.path.join(DATA_DIR, "verify.json")
+    green = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            green = json.load(f)
+    graph = CrateGraph(os.path.join(BASE_DIR, "src"))
+    with open(os.path.join(BASE_DIR, "Cargo.toml"), "rb") as f:
+        manifest = hashlib.sha1(f.read()).hexdigest()
+    profile = "release" if release else "debug"
+    selected = {}
+    entries = bin_index.refresh().values()
+    for entry in sorted(entries, key=lambda x: id_sort_key(x["id"])):
+        if not fnmatch(entry["id"], pattern):
+            continue
+        name = f"leetcode_{entry['id']}"
+        last = green.get(name, {})
+        state = {"sha1": entry["sha1"], "lib": graph.lib_sha1}
+        if all(last.get(k) == v for k, v in state.items()):
+            # the file is as it last passed, what it uses is known
+            state.update(roots=last["roots"], includes=last["includes"])
+        else:
+            path = os.path.join(bin_index.bin_dir, f"{name}.rs")
+            with open(path, "r", encoding="utf-8") as f:
+                source = f.read()
+            state.update(roots=graph.roots(source), includes=include_re.findall(source))
+        included = []
+        for file in state["includes"]:
+            with open(os.path.join(bin_index.bin_dir, file), "rb") as f:
+                included.append(hashlib.sha1(f.read()).hexdigest())
+        state["hash"] = graph.fingerprint(
+            entry["sha1"], state["roots"], manifest, profile, *included
+        )
+        if everything or last.get("hash") != state["hash"]:
+            selected[name] = state
+    print(f"{len(selected)} to verify, {len(entries) - len(selected)} skipped")
+    if dry_run:
+        for name in selected:
+            print(name)
+        return
+    target_dir = target_dir or os.path.join(BASE_DIR, "target")
+    names = list(selected)
+    # what cargo builds, {binary: {test: solution}}, in the shard layout the
+    # test binaries holding the selected solutions
+    kind = "test" if layout.shards else "bin"
+    units = {}
+    pending_path = os.path.join(layout.tests_dir, "pending.rs")
+    pending = layout.pending.copy()
+    if layout.shards:
+        layout.write_shards()
+        for n, modules in enumerate(layout.modules()):
+            for pid, module in modules:
+                if f"leetcode_{pid}" in selected:
+                    tests = units.setdefault(f"shard_{n}", {})
+                    tests[f"{module}::main"] = f"leetcode_{pid}"
+        pending_modules = [
+            (pid, module)
+            for pid, module in layout.names().items()
+            if pid in pending and f"leetcode_{pid}" in selected
+        ]
+        if pending_modules:
+            layout.write_binary(pending_path, "pending solutions", pending_modules)
+            units["pending"] = {
+                f"{i}::main": f"leetcode_{p}" for p, i in pending_modules
+            }
+    else:
+        units = {i: {i: i} for i in names}
+    binaries = [i for i in units if i != "pending"]
+    shards = [binaries[i : i + shard] for i in range(0, len(binaries), shard)]
+    if "pending" in units:
+        # likely not to compile, which stops cargo building the shards with it
+        shards.append(["pending"])
+    failed = []
+    start = time.perf_counter()
+
+    def save():
+        os.makedirs(DATA_DIR, exist_ok=True)
+        tmp = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(green, f)
+        os.replace(tmp, state_path)
+
+    def report(result):
+        name, passed, seconds, tail = result
+        print(f"{'PASS' if passed else 'FAIL'} {name} {seconds:.3f}s")
+        if passed:
+            green[name] = dict(selected[name], time=seconds)
+            layout.pending.discard(name.removeprefix("leetcode_"))
+        else:
+            green.pop(name, None)
+            failed.append(name)
+            print(tail)
+
+    def run(job):
+        binary, executable = job
+        if kind == "test":
+            return run_tests((binary, executable, units[binary], timeout))
+        return [run_binary((binary, executable, timeout))]
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        runs = []
+        for n, bins in enumerate(shards, 1):
+            build_start = time.perf_counter()
+            built, errors, modules = cargo_build(bins, release, target_dir, kind)
+            logger.info(
+                f"shard {n}/{len(shards)}: {len(built)}/{len(bins)} built in "
+                f"{time.perf_counter() - build_start:.1f}s"
             )
-            result.append(f"{prefix}::{used_names};")
-    other_funcs_content = []
-    for other_func_name, other_func_body in other_funcs.items():
-        if other_func_name in func_body:
-            other_funcs_content.append(other_func_body)
-    other_funcs_content = "\n\n".join(other_funcs_content)
-    for o in other:
-        if o.startswith("static ") or o.startswith("const "):
-            result.append(o)
-    if other_funcs_content:
-        result.append(other_funcs_content)
-    func_body = func_body.replace(func_name, problem_func_name)
-    result.append("impl Solution {")
-    result.extend(["    " + i for i in func_body.split("\n")])
-    result.append("}")
-    pyperclip.copy("\n".join(result))
+            # a module failing to compile stops its whole binary, make it
+            # pending and build the binary again for the other tests
+            culprits = set(modules) - layout.pending
+            layout.pending.update(culprits)
+            again = []
+            for binary, error in errors.items():
+                tests = units[binary]
+                removed = 0
+                for test, name in list(tests.items()):
+                    pid = name.removeprefix("leetcode_")
+                    if pid in modules:
+                        report((name, False, 0.0, modules[pid].strip()))
+                        del tests[test]
+                        removed += 1
+                if tests and (removed or culprits and binary != "pending"):
+                    again.append(binary)
+                    continue
+                for name in tests.values():
+                    report((name, False, 0.0, error.strip()))
+            if again:
+                layout.write_shards()
+                if "pending" in again:
+                    tests = units["pending"]
+                    modules = [i for i in pending_modules if f"{i[1]}::main" in tests]
+                    layout.write_binary(pending_path, "pending solutions", modules)
+                shards.append(again)
+            ready = [(i, built[i]) for i in bins if i in built]
+            runs.extend(pool.submit(run, i) for i in ready)
+            # report whatever finished while the next shard builds
+            while runs and runs[0].done():
+                for result in runs.pop(0).result():
+                    report(result)
+            save()
+        for future in runs:
+            for result in future.result():
+                report(result)
+    save()
+    if os.path.exists(pending_path):
+        os.unlink(pending_path)
+    if layout.pending != pending:
+        layout.save(layout.shards)
+        layout.write_shards()
+        print(f"{len(layout.pending)} pending in {layout.manifest}")
+    print(
+        f"{len(names) - len(failed)}/{len(names)} passed in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    if failed:
+        raise click.ClickException(f"{len(failed)} failed: {' '.join(failed)}")
+
+
+# the corpus, snapshots and baselines are versioned, unlike DATA_DIR. baselines
+# hold ratios to a reference timed in the same run, not wall clock numbers, so
+# they still mean something on another machine
+BENCH_DIR = os.path.join(BASE_DIR, "bench")
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+
+
+def corpus_detail(entry):
+    """ProblemDetail from a recorded {key, data} payload"""
+    if entry["key"].startswith("question/"):
+        return problem_detail_from_question(entry["data"])
+    return problem_detail_from_contest_question(entry["data"]["question"])
+
+
+def synthetic_detail(n):
+    """a problem whose examples hold n numbers, to expose superlinear parsing"""
+    nums = ",".join(str(i) for i in range(n))
+    side = max(1, int(n**0.5))
+    grid = ",".join("[" + ",".join(["1"] * side) + "]" for _ in range(side))
+    words = ",".join(f'"w{i}"' for i in range(n // 10))
+    args = f"nums = [{nums}], grid = [{grid}], words = [{words}]"
+    content = (
+        "<p><strong>示例 1：</strong></p>\n<pre>\n"
+        f"<strong>输入：</strong>{args}\n"
+        f"<strong>输出：</strong>[{nums}]\n</pre>\n\n"
+        "<p><strong>示例 2：</strong></p>\n<pre>\n<strong>输入：</strong>\n"
+        f"nums = [{nums}]\ngrid = [{grid}]\nwords = [{words}]\n"
+        "<strong>输出：</strong>[]\n<strong>解释：</strong>x\n</pre>\n\n"
+    )
+    code = (
+        "impl Solution {\n    pub fn f(nums: Vec<i32>, grid: Vec<Vec<i32>>, "
+        "words: Vec<String>) -> Vec<i32> {\n\n    }\n}"
+    )
+    return ProblemDetail(str(n), "synthetic", content, {"rust": code})
+
+
+def load_corpus(path, scale):
+    details = []
+    for file in sorted(Path(path).glob("*.json")) if os.path.isdir(path) else []:
+        with open(file, "r", encoding="utf-8") as f:
+            detail = corpus_detail(json.load(f))
+        if detail:
+            details.append((file.stem, detail))
+    if scale:
+        details.append((f"synthetic_{scale}", synthetic_detail(scale)))
+    return details
+
+
+def bench_calls(details):
+    """{function: [zero-arg call]} over the corpus"""
+    calls = {
+        "input_and_output": [],
+        "trans_arg": [],
+        "rust_testcase": [],
+        "rust_template": [],
+    }
+    for _, detail in details:
+        calls["input_and_output"].append(detail.input_and_output)
+        calls["rust_testcase"].append(detail.rust_testcase)
+        calls["rust_template"].append(detail.rust_template)
+        try:
+            cases = detail.arg_cases()
+        except Exception:
+            continue
+        for args, (o, return_type) in cases:
+            for arg, type in args:
+                calls["trans_arg"].append(lambda a=arg, t=type: trans_arg(a, t))
+            calls["trans_arg"].append(lambda a=o, t=return_type: trans_arg(a, t, True))
+    return calls
+
+
+def measure(calls, repeat):
+    """(best seconds for all calls, peak traced bytes, failed calls)"""
+    best = float("inf")
+    failed = 0
+    for _ in range(repeat):
+        failed = 0
+        start = time.perf_counter()
+        for call in calls:
+            try:
+                call()
+            except Exception:
+                failed += 1
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    for call in calls:
+        try:
+            call()
+        except Exception:
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, failed
+
+
+def reference_time(repeat):
+    """best seconds of a fixed stdlib workload, the unit `bench run` compares in"""
+    data = [{"id": i, "slug": f"s-{i}", "tags": [str(i)] * 4} for i in range(2000)]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = json.dumps(data)
+        re.findall(r'"s-(\d+)"', text)
+        json.loads(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_baseline(name):
+    path = os.path.join(BENCH_DIR, name)
+    if not os.path.exists(path):
+        return path, {}
+    with open(path, "r", encoding="utf-8") as f:
+        return path, json.load(f)
+
+
+def save_baseline(path, result):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"baseline saved to {path}")
+
+
+def snapshot(detail: ProblemDetail):
+    try:
+        cases = "\n".join(detail.rust_testcase())
+    except Exception as e:
+        cases = f"generate testcases fail: {e}"
+    code, main_use = detail.rust_template(cases)
+    return "\n".join([code, main_use, cases])
+
+
+@cli.group()
+def bench():
+    """benchmark and snapshot the codegen hot path over the corpus in bench/"""
+
+
+@bench.command("record")
+@click.option("--corpus", default=CORPUS_DIR, help="corpus directory")
+@click.argument("slugs", nargs=-1)
+def bench_record(corpus, slugs):
+    """save problem payloads into the corpus, every cached detail without SLUGS"""
+    os.makedirs(corpus, exist_ok=True)
+    entries = []
+    if slugs:
+        get_problem_details(list(slugs))
+        keys = {f"question/{i}" for i in slugs}
+    for file in cache.entries():
+        with open(file, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        key = entry["key"]
+        if slugs and key not in keys:
+            continue
+        if key.startswith("question/") or re.fullmatch(r"contest/[^/]+/[^/]+", key):
+            entries.append(entry)
+    for entry in entries:
+        name = entry["key"].replace("/", "_")
+        entry = {"key": entry["key"], "data": entry["data"]}
+        with open(os.path.join(corpus, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+    print(f"{len(entries)} payloads recorded in {corpus}")
+
+
+@bench.command("run")
+@click.option("--corpus", default=CORPUS_DIR, help="corpus directory")
+@click.option("--scale", default=10000, help="numbers in the synthetic example, 0 off")
+@click.option("-r", "--repeat", default=5, help="best of this many runs")
+@click.option("--threshold", default=0.2, help="slowdown ratio flagged as regression")
+@click.option("--save", is_flag=True, help="store the result as the new baseline")
+def bench_run(corpus, scale, repeat, threshold, save):
+    """per function throughput and peak memory, compared with the baseline"""
+    details = load_corpus(corpus, scale)
+    baseline_path, baseline = load_baseline("baseline.json")
+    reference = reference_time(repeat)
+    result = {}
+    regressions = []
+    print(f"{len(details)} problems, reference {reference * 1e3:.2f} ms")
+    print(
+        f"{'function':<18}{'calls':>8}{'fail':>6}{'us/call':>12}"
+        f"{'calls/s':>12}{'peak KB':>10}{'baseline':>12}"
+    )
+    for name, calls in bench_calls(details).items():
+        seconds, peak, failed = measure(calls, repeat)
+        per_call = seconds / max(len(calls), 1) * 1e6
+        result[name] = {
+            "calls": len(calls),
+            "us_per_call": per_call,
+            "per_reference": seconds / max(len(calls), 1) / reference,
+            "peak": peak,
+        }
+        line = (
+            f"{name:<18}{len(calls):>8}{failed:>6}{per_call:>12.1f}"
+            f"{len(calls) / max(seconds, 1e-9):>12.0f}{peak / 1024:>10.0f}"
+        )
+        if "per_reference" in baseline.get(name, {}):
+            change = result[name]["per_reference"] / baseline[name]["per_reference"] - 1
+            line += f"{change:>+11.0%}"
+            if change > threshold:
+                line += " REGRESSION"
+                regressions.append(name)
+        print(line)
+    if save:
+        save_baseline(baseline_path, result)
+    if regressions:
+        raise click.ClickException(f"regression in {', '.join(regressions)}")
+
+
+@bench.command("snapshot")
+@click.option("--corpus", default=CORPUS_DIR, help="corpus directory")
+@click.option("--update", is_flag=True, help="accept the current output")
+def bench_snapshot(corpus, update):
+    """compare generated test code for the corpus with the stored snapshots"""
+    import difflib
+
+    path = os.path.join(BENCH_DIR, "snapshots.json")
+    stored = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    current = {name: snapshot(detail) for name, detail in load_corpus(corpus, 0)}
+    changed = [i for i in current if i in stored and stored[i] != current[i]]
+    for name in changed:
+        diff = difflib.unified_diff(
+            stored[name].split("\n"),
+            current[name].split("\n"),
+            f"{name} (snapshot)",
+            f"{name} (current)",
+            lineterm="",
+        )
+        print("\n".join(diff))
+    new = [i for i in current if i not in stored]
+    print(f"{len(current)} problems, {len(changed)} changed, {len(new)} new")
+    if update:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=1)
+    elif changed:
+        raise click.ClickException("snapshot mismatch, rerun with --update to accept")
+
+
+importtime_re = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)")
+
+
+def startup_profile(command):
+    """(wall seconds, {module: cumulative us}, top level import us) of one run"""
+    import shlex
+    import subprocess
+    import sys
+
+    args = [sys.executable, "-X", "importtime", os.path.realpath(__file__)]
+    start = time.perf_counter()
+    rsp = subprocess.run(
+        args + shlex.split(command),
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    modules = {}
+    total = 0
+    for line in rsp.stderr.split("\n"):
+        m = importtime_re.match(line)
+        if not m:
+            continue
+        cumulative, indent, module = int(m.group(1)), m.group(2), m.group(3)
+        modules[module] = cumulative
+        if len(indent) == 1:
+            total += cumulative
+    return wall, modules, total
+
+
+def interpreter_startup(runs):
+    """best wall seconds of a bare interpreter, the unit `bench startup` compares in"""
+    import subprocess
+    import sys
+
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=BASE_DIR)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@bench.command("startup")
+@click.option("-n", "--runs", default=5, help="best of this many runs")
+@click.option("--forbid", default="requests,pyperclip", help="modules not allowed")
+@click.option("--top", default=5, help="heaviest imports shown per command")
+@click.option("--threshold", default=0.3, help="slowdown ratio flagged as regression")
+@click.option("--save", is_flag=True, help="store the result as the new baseline")
+@click.argument("commands", nargs=-1)
+def bench_startup(runs, forbid, top, threshold, save, commands):
+    """-X importtime breakdown per command line, e.g. 'copy 1' or 'list 15*'"""
+    commands = commands or ("--help", "list 1", "stats", "copy --help")
+    forbid = [i for i in forbid.split(",") if i]
+    baseline_path, baseline = load_baseline("startup_baseline.json")
+    reference = interpreter_startup(runs)
+    print(f"{'python -c pass':<20}{reference * 1000:>8.1f} ms wall")
+    result = {}
+    problems = []
+    for command in commands:
+        profiles = [startup_profile(command) for _ in range(runs)]
+        wall, modules, total = min(profiles, key=lambda x: x[0])
+        # times the bare interpreter startup
+        result[command] = wall / reference
+        line = f"{command:<20}{wall * 1000:>8.1f} ms wall{total / 1000:>8.1f} ms import"
+        line += f"{result[command]:>7.1f}x"
+        if command in baseline:
+            change = result[command] / baseline[command] - 1
+            line += f"{change:>+8.0%}"
+            if change > threshold:
+                problems.append(f"{command} startup regression")
+        print(line)
+        heaviest = sorted(modules.items(), key=lambda x: -x[1])
+        for module, cumulative in [i for i in heaviest if "." not in i[0]][:top]:
+            print(f"    {module:<24}{cumulative / 1000:>8.1f} ms")
+        for module in forbid:
+            if module in modules:
+                problems.append(f"{command} imports {module}")
+    if save:
+        save_baseline(baseline_path, result)
+    if problems:
+        raise click.ClickException(", ".join(problems))
+
+
+operation_re = re.compile(r"query\s+(\w+)")
+
+
+class ReplayServer(object):
+    """stand-in for the GraphQL endpoint answering from recorded responses
+
+    the recordings are what normal runs leave in the response cache
+    (question/, contest/, season/ keys) plus the catalog. every request can
+    be delayed by `latency` seconds (+-50%), throttled with a 429 or answered
+    with a malformed body with the given probabilities. a "#n" suffix on a
+    slug is ignored, so a load test can ask for one recording many times.
+    """
+
+    def __init__(self, latency=0.0, throttle=0.0, malformed=0.0, retry_after=0.1):
+        self.latency = latency
+        self.throttle = throttle
+        self.malformed = malformed
+        self.retry_after = retry_after
+        self.problemset = []
+        self.questions = {}
+        self.panels = {}
+        self.contest_questions = {}
+        self.seasons = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def load(self, cache_dir, catalog_path):
+        if os.path.exists(catalog_path):
+            with open(catalog_path, "r", encoding="utf-8") as f:
+                self.problemset = json.load(f)["questions"]
+        for file in ResponseCache(cache_dir).entries():
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            kind, _, name = entry["key"].partition("/")
+            if kind == "question":
+                self.questions[name] = entry["data"]
+            elif kind == "season":
+                self.seasons[name] = entry["data"]
+            elif kind == "contest" and "/" in name:
+                self.contest_questions[tuple(name.split("/", 1))] = entry["data"]
+            elif kind == "contest":
+                self.panels[name] = entry["data"]
+        return self
+
+    def question(self, slug):
+        return self.questions.get(slug.partition("#")[0])
+
+    def contest_question(self, contest, slug):
+        return self.contest_questions.get((contest, slug.partition("#")[0]))
+
+    def aliased(self, variables, lookup):
+        return {
+            f"q{k[1:]}": lookup(v)
+            for k, v in variables.items()
+            if k[0] == "s" and k[1:].isdigit()
+        }
+
+    def problemset_page(self, variables):
+        questions = self.problemset
+        keyword = (variables.get("filters") or {}).get("searchKeywords")
+        if keyword:
+            questions = [
+                i
+                for i in questions
+                if keyword in (i["frontendQuestionId"], i["titleSlug"])
+                or keyword in i["title"]
+                or keyword in (i.get("titleCn") or "")
+            ]
+        skip, limit = variables.get("skip", 0), variables.get("limit", 50)
+        return {
+            "problemsetQuestionList": {
+                "hasMore": skip + limit < len(questions),
+                "total": len(questions),
+                "questions": questions[skip : skip + limit],
+            }
+        }
+
+    def data(self, operation, v):
+        contest = v.get("contestSlug")
+        if operation == "problemsetQuestionList":
+            return self.problemset_page(v)
+        if operation == "getQuestionDetail":
+            return {"question": self.question(v["titleSlug"])}
+        if operation == "getQuestionDetails":
+            return self.aliased(v, self.question)
+        if operation == "panelQuestionList":
+            panel = self.panels.get(v.get("envId"), [])
+            return {"panelQuestionList": {"questions": panel}}
+        if operation == "contestQuestion":
+            question = self.contest_question(contest, v["questionSlug"])
+            return {"contestQuestion": question}
+        if operation == "contestQuestions":
+            return self.aliased(v, lambda slug: self.contest_question(contest, slug))
+        if operation == "contestGroup":
+            return {"contestGroup": {"contests": self.seasons.get(v["slug"], [])}}
+        return None
+
+    def answer(self, payload):
+        """return (status, headers, body) for one GraphQL payload"""
+        operation = payload.get("operationName")
+        if not operation:
+            m = operation_re.search(payload.get("query", ""))
+            operation = m.group(1) if m else ""
+        with self.lock:
+            self.stats[operation] += 1
+            roll = random.random()
+        if self.latency:
+            time.sleep(random.uniform(self.latency / 2, self.latency * 1.5))
+        if roll < self.throttle:
+            with self.lock:
+                self.stats["429"] += 1
+            return 429, {"Retry-After": str(self.retry_after)}, ""
+        if roll < self.throttle + self.malformed:
+            with self.lock:
+                self.stats["malformed"] += 1
+            if random.random() < 0.5:
+                return 200, {}, "<html><body>502 Bad Gateway</body></html>"
+            return 200, {}, '{"data": {"question'
+        data = self.data(operation, payload.get("variables") or {})
+        if data is None:
+            body = {"errors": [{"message": f"unknown operation {operation}"}]}
+        else:
+            body = {"data": data}
+        return 200, {}, json.dumps(body, ensure_ascii=False)
+
+    def server(self, host="127.0.0.1", port=0):
+        """ThreadingHTTPServer answering POST /graphql/, serve_forever() it"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def reply(self, status, headers, body):
+                body = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                except ValueError:
+                    return self.reply(400, {}, '{"errors": ["bad json"]}')
+                self.reply(*replay.answer(payload))
+
+            def do_GET(self):
+                self.reply(404, {}, "{}")
+
+            def do_HEAD(self):
+                self.reply(200, {}, "")
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+
+def replay_options(func):
+    for option in reversed(
+        [
+            click.option("--latency", default=0.05, help="seconds added per request"),
+            click.option("--throttle", default=0.0, help="share of 429 responses"),
+            click.option("--malformed", default=0.0, help="share of broken bodies"),
+            click.option(
+                "--cache-dir",
+                default=os.path.join(DATA_DIR, "cache"),
+                help="response cache holding the recordings",
+            ),
+        ]
+    ):
+        func = option(func)
+    return func
+
+
+@bench.command("serve")
+@click.option("--port", default=8765)
+@replay_options
+def bench_serve(port, latency, throttle, malformed, cache_dir):
+    """replay recorded responses, use with --endpoint and --cache-ttl 0"""
+    replay = ReplayServer(latency, throttle, malformed).load(cache_dir, Catalog.path)
+    server = replay.server(port=port)
+    print(
+        f"{len(replay.questions)} questions, {len(replay.panels)} contests, "
+        f"{len(replay.seasons)} seasons on http://127.0.0.1:{port}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(dict(replay.stats))
+
+
+@bench.command("load")
+@replay_options
+@click.option("-j", "--jobs", default=8, help="concurrent requests")
+@click.option("--batch", default=DETAIL_BATCH, help="problem details per request")
+@click.option("--rate", default=1000.0, help="max requests per second")
+@click.option("-n", "--count", default=200, help="problems fetched per round")
+@click.option("-r", "--rounds", default=3)
+def bench_load(
+    latency, throttle, malformed, cache_dir, jobs, batch, rate, count, rounds
+):
+    """fetch and render recorded problems through a local replay server"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    replay = ReplayServer(latency, throttle, malformed).load(cache_dir, Catalog.path)
+    recorded = [k for k, v in replay.questions.items() if v]
+    if not recorded:
+        raise click.ClickException(f"no recorded question/ entries in {cache_dir}")
+    server = replay.server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    set_endpoint(f"http://127.0.0.1:{server.server_address[1]}")
+    limiter.set_rate(rate)
+    limiter.burst = max(limiter.burst, jobs)
+    transport.resize(max(jobs, POOL_SIZE))
+    slugs = [f"{recorded[i % len(recorded)]}#{i}" for i in range(count)]
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool, tempfile.TemporaryDirectory(
+            prefix="leetcode-load-"
+        ) as tmp:
+            for n in range(rounds):
+                # a fresh cache every round, all details go over the wire
+                cache.path = os.path.join(tmp, str(n))
+                cache.size = None
+                start = time.perf_counter()
+                stats = dict(transport.stats)
+                details = get_problem_details(slugs, batch, jobs)
+                renders = [i for i in details.values() if i]
+                rendered = sum(1 for text in pool.map(render, renders) if text)
+                elapsed = time.perf_counter() - start
+                requests_made = transport.stats["requests"] - stats["requests"]
+                retries = transport.stats["retries"] - stats["retries"]
+                print(
+                    f"round {n + 1}: {rendered}/{count} problems in "
+                    f"{elapsed:.3f}s, {rendered / elapsed:.1f} problems/s, "
+                    f"{requests_made} requests, {retries} retries"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(dict(replay.stats))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+//! 运行时解析 leetcode 样例字面量，用于太大而不适合内联成 vec! 的样例
+//!
+//! `parse::<Vec<Vec<i32>>>(include_str!("../../testdata/1_0.txt"))`
+
+pub struct Parser<'a> {
+    s: &'a [u8],
+    i: usize,
+}
+
+impl<'a> Parser<'a> {
+    pub fn new(s: &'a str) -> Self {
+        Parser { s: s.as_bytes(), i: 0 }
+    }
+
+    fn skip_ws(&mut self) {
+        while self.i < self.s.len() && self.s[self.i].is_ascii_whitespace() {
+            self.i += 1;
+        }
+    }
+
+    fn peek(&mut self) -> u8 {
+        self.skip_ws();
+        if self.i < self.s.len() { self.s[self.i] } else { 0 }
+    }
+
+    fn expect(&mut self, c: u8) {
+        let got = self.peek();
+        assert_eq!(got as char, c as char, "at byte {}", self.i);
+        self.i += 1;
+    }
+
+    /// 数字、true、false、null
+    pub fn token(&mut self) -> &'a str {
+        self.skip_ws();
+        let start = self.i;
+        while self.i < self.s.len() && !matches!(self.s[self.i], b',' | b']' | b' ' | b'\n' | b'\r' | b'\t') {
+            self.i += 1;
+        }
+        std::str::from_utf8(&self.s[start..self.i]).unwrap()
+    }
+
+    pub fn string(&mut self) -> String {
+        self.expect(b'"');
+        let mut out = Vec::new();
+        while self.s[self.i] != b'"' {
+            if self.s[self.i] == b'\\' {
+                self.i += 1;
+                out.push(match self.s[self.i] {
+                    b'n' => b'\n',
+                    b't' => b'\t',
+                    b'r' => b'\r',
+                    c => c,
+                });
+            } else {
+                out.push(self.s[self.i]);
+            }
+            self.i += 1;
+        }
+        self.i += 1;
+        String::from_utf8(out).unwrap()
+    }
+
+    pub fn list<T: FromData>(&mut self) -> Vec<T> {
+        self.expect(b'[');
+        let mut out = Vec::new();
+        if self.peek() == b']' {
+            self.i += 1;
+            return out;
+        }
+        loop {
+            out.push(T::parse(self));
+            match self.peek() {
+                b',' => self.i += 1,
+                _ => break,
+            }
+        }
+        self.expect(b']');
+        out
+    }
+}
+
+pub trait FromData: Sized {
+    fn parse(p: &mut Parser) -> Self;
+}
+
+macro_rules! from_token {
+    ($($t:ty),*) => {
+        $(impl FromData for $t {
+            fn parse(p: &mut Parser) -> Self {
+                let token = p.token();
+                token.parse().unwrap_or_else(|_| panic!("bad {} {}", stringify!($t), token))
+            }
+        })*
+    };
+}
+
+from_token!(i32, i64, u32, u64, usize, isize, f32, f64, bool);
+
+impl FromData for String {
+    fn parse(p: &mut Parser) -> Self {
+        p.string()
+    }
+}
+
+impl FromData for char {
+    fn parse(p: &mut Parser) -> Self {
+        p.string().chars().next().unwrap()
+    }
+}
+
+impl<T: FromData> FromData for Vec<T> {
+    fn parse(p: &mut Parser) -> Self {
+        p.list()
+    }
+}
+
+impl<T: FromData> FromData for Option<T> {
+    fn parse(p: &mut Parser) -> Self {
+        if p.peek() == b'n' {
+            p.token();
+            None
+        } else {
+            Some(T::parse(p))
+        }
+    }
+}
+
+pub fn parse<T: FromData>(s: &str) -> T {
+    T::parse(&mut Parser::new(s))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_parse() {
+        assert_eq!(parse::<Vec<i32>>("[1, -2,3]\n"), vec![1, -2, 3]);
+        assert_eq!(parse::<Vec<Vec<i64>>>("[[1],[],[2,3]]"), vec![vec![1], vec![], vec![2, 3]]);
+        assert_eq!(parse::<Vec<String>>(r#"["a,b","c\"d",""]"#), vec!["a,b", "c\"d", ""]);
+        assert_eq!(parse::<Vec<Vec<char>>>(r#"[["5","."]]"#), vec![vec!['5', '.']]);
+        assert_eq!(parse::<Vec<Option<i32>>>("[1,null,2]"), vec![Some(1), None, Some(2)]);
+        assert_eq!(parse::<f64>("2"), 2.0);
+        assert_eq!(parse::<bool>("true"), true);
+        assert_eq!(parse::<String>(r#""abc""#), "abc");
+    }
+}
@@ -11,6 +11,7 @@ pub mod bit_index_tree;
 pub mod treap;
 pub mod multi_set;
 pub mod bitset;
+pub mod data;
 
 pub fn unorder<T: Ord>(mut list: Vec<T>) -> Vec<T> {
     list.sort_unstable();